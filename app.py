@@ -1,11 +1,36 @@
 from dash import Dash
-from utils.data import load_demographic_indicators, load_demographic_indicators_notes
+from utils.data import (
+    ensure_demographic_indicators_cache,
+    load_demographic_indicators,
+    load_demographic_indicators_notes,
+)
 import layouts
 import callbacks
+from precompute import load_artifacts
+from utils.dataset import Dataset, DatasetHandle, DatasetWatcher, dataset_version
+from utils.export import DataExport
+from utils.instrumentation import metrics
+from utils.responses import response_layer
+
+
+# Charger une version des données, avec les cartes et camemberts précalculés
+# pour les années des sliders (precompute.py)
+def load_dataset(version):
+    df = load_demographic_indicators()
+    return Dataset(
+        version,
+        df,
+        load_demographic_indicators_notes(),
+        load_artifacts(df),
+        store=ensure_demographic_indicators_cache(),
+    )
 
-# Charger les données
-df = load_demographic_indicators()
-df_notes = load_demographic_indicators_notes()
+
+datasets = DatasetHandle(load_dataset(dataset_version()))
+
+# Nouvelle version des fichiers de données chargée en arrière-plan et publiée
+# sans redémarrer les workers (DATAVIZ_RELOAD_INTERVAL)
+watcher = DatasetWatcher(datasets, load_dataset)
 
 # Créer une application Dash
 app = Dash(
@@ -14,11 +39,35 @@ app = Dash(
 
 server = app.server
 
-# Charger la mise en page
-app.layout = layouts.home_page(df, df_notes)
+
+# Mise en page construite une fois par version des données
+def serve_layout():
+    return datasets.current().derived(
+        "layout", lambda dataset: layouts.home_page(dataset.df, dataset.df_notes)
+    )
+
+
+app.layout = serve_layout
 
 # Enregistrer les callbacks
-callbacks.register_callbacks(df, df_notes)
+callbacks.register_callbacks(datasets)
+
+# Mesures des callbacks, publiées sur /metrics (Prometheus) et /metrics.json
+metrics.instrument_callbacks()
+metrics.gauges["figure_cache"] = callbacks.figure_cache.stats
+metrics.gauges["dataset"] = watcher.stats
+metrics.gauges["hover_requests"] = callbacks.hover_requests.stats
+metrics.register_routes(server)
+
+# Export des données filtrées (Arrow IPC, Parquet ou CSV) sur /api/data.<format>
+# et des agrégats régionaux sur /api/aggregate.<format>
+DataExport(datasets).register(server)
+
+# Compression gzip/brotli de la mise en page, des callbacks et des fichiers
+# de Dash, ETag et réponses 304 pour les requêtes GET
+response_layer.register(server)
+
+watcher.start()
 
 if __name__ == "__main__":
     app.run_server(debug=False)
@@ -0,0 +1,236 @@
+// Callbacks exécutés dans le navigateur (voir register_callbacks) : mises en
+// forme de texte, visibilité, type des axes et chiffres clés, sans aller-retour
+// avec le serveur
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dataviz: {
+        selected_country_heading: function (selectedCountry) {
+            return "Pays sélectionné : " + selectedCountry;
+        },
+
+        selected_time_heading: function (selectedDate) {
+            return "Date sélectionnée : " + selectedDate;
+        },
+
+        map_year_title: function (selectedYear) {
+            return "Ventilation spatiale de l'age médian dans le monde en " + selectedYear;
+        },
+
+        // Masquer les camemberts si l'option sélectionnée n'est pas 'World'
+        hide_elements: function (selectedLocation) {
+            return selectedLocation !== "World" ? {display: "none"} : null;
+        },
+
+        // Chiffres clés, ou message d'invite tant qu'aucune localisation n'est
+        // sélectionnée
+        key_stats_placeholder: function (selectedLocation) {
+            if (selectedLocation === null || selectedLocation === undefined) {
+                return [{display: "none"}, {"font-size": "1.2em", "text-align": "center"}];
+            }
+            return [null, {display: "none"}];
+        },
+
+        // Chiffres clés de l'année sélectionnée, lus dans les séries de la
+        // localisation envoyées une fois par le serveur (location-data)
+        key_stats: function (selectedDate, data) {
+            var columns = [
+                "TPopulation1Jan",
+                "Births",
+                "Deaths",
+                "LExMale",
+                "LExFemale",
+                "NetMigrations",
+            ];
+            var i = data ? data.Time.indexOf(Number(selectedDate)) : -1;
+            return columns.map(function (column) {
+                var value = i >= 0 ? data[column][i] : null;
+                return value === null || value === undefined ? "-" : Math.round(value);
+            });
+        },
+
+        // Animations : les images envoyées par le serveur sont appliquées une
+        // à une au graphique affiché, puis il revient à l'année du slider
+        play_map: function (frames, selectedYear) {
+            return playFrames("map-content", "map-play", frames, selectedYear, function (year) {
+                window.dash_clientside.set_props("map-year-title", {
+                    children: window.dash_clientside.dataviz.map_year_title(year),
+                });
+            });
+        },
+
+        play_crossfilter: function (frames, selectedYear) {
+            return playFrames("crossfilter-indicator-scatter", "crossfilter-play", frames, selectedYear);
+        },
+
+        // Lieu survolé du graphique de dispersion, transmis au serveur une
+        // fois la souris arrêtée et seulement s'il a changé. Chaque envoi est
+        // numéroté pour que le serveur abandonne les requêtes dépassées
+        hover_location: function (hoverData) {
+            var location = hoverData && hoverData.points[0].hovertext;
+            clearTimeout(hoverTimer);
+            if (location && location !== hoverLast) {
+                hoverTimer = setTimeout(function () {
+                    hoverLast = location;
+                    window.dash_clientside.set_props("hover-location", {
+                        data: {location: location, client: HOVER_CLIENT, seq: ++hoverSeq},
+                    });
+                }, HOVER_DEBOUNCE_MS);
+            }
+            return window.dash_clientside.no_update;
+        },
+
+        // Type linéaire ou logarithmique des axes du graphique de dispersion
+        scatter_axis_types: function (xaxisType, yaxisType, figure) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            return setAxisType(setAxisType(figure, "xaxis", xaxisType), "yaxis", yaxisType);
+        },
+
+        // Type de l'axe des valeurs d'une série temporelle
+        timeseries_axis_type: function (axisType, figure) {
+            return setAxisType(figure, "yaxis", axisType);
+        },
+    },
+});
+
+// Copie de la figure avec le type d'axe demandé ("Linear" ou "Log")
+function setAxisType(figure, axis, axisType) {
+    if (!figure) {
+        return window.dash_clientside.no_update;
+    }
+    var layout = Object.assign({}, figure.layout);
+    layout[axis] = Object.assign({}, layout[axis], {
+        type: axisType === "Linear" ? "linear" : "log",
+    });
+    return Object.assign({}, figure, {layout: layout});
+}
+
+// Délai sans mouvement de la souris avant l'envoi du lieu survolé
+var HOVER_DEBOUNCE_MS = 150;
+
+// Identifiant de l'onglet et numéro du dernier survol envoyé
+var HOVER_CLIENT = Math.random().toString(36).slice(2);
+var hoverSeq = 0;
+var hoverLast = "World";
+var hoverTimer = null;
+
+// Durée d'affichage de chaque année pendant une animation, en millisecondes
+var PLAYBACK_FRAME_MS = 100;
+
+var TYPED_ARRAYS = {
+    i1: Int8Array,
+    u1: Uint8Array,
+    i2: Int16Array,
+    u2: Uint16Array,
+    i4: Int32Array,
+    u4: Uint32Array,
+    f4: Float32Array,
+    f8: Float64Array,
+};
+
+// Tableau binaire ({dtype, bdata}, voir utils/serialization.py) ou liste
+function decodeArray(spec) {
+    if (Array.isArray(spec)) {
+        return spec;
+    }
+    var binary = atob(spec.bdata);
+    var bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new TYPED_ARRAYS[spec.dtype](bytes.buffer);
+}
+
+// Valeurs de chaque année, reconstituées en cumulant les écarts à l'année
+// précédente (voir delta_encode) ; null pour les valeurs manquantes
+function decodeFrames(encoded) {
+    var base = decodeArray(encoded.base);
+    var deltas = decodeArray(encoded.deltas);
+    var missing = decodeArray(encoded.missing);
+    var n = base.length;
+    var units = Float64Array.from(base);
+    var frames = [];
+    for (var t = 0; t < decodeArray(encoded.years).length; t++) {
+        if (t > 0) {
+            for (var i = 0; i < n; i++) {
+                units[i] += deltas[(t - 1) * n + i];
+            }
+        }
+        var values = new Array(n);
+        for (var j = 0; j < n; j++) {
+            values[j] = units[j] / encoded.scale;
+        }
+        frames.push(values);
+    }
+    for (var k = 0; k < missing.length; k++) {
+        frames[Math.floor(missing[k] / n)][missing[k] % n] = null;
+    }
+    return frames;
+}
+
+// Joue les images de chaque attribut de la première trace (z de la carte, x
+// et y du graphique de dispersion). L'échelle de couleurs est fixée sur
+// l'ensemble des années pour que les couleurs restent comparables
+function playFrames(graphId, buttonId, bundle, selectedYear, onFrame) {
+    var graph = document.querySelector("#" + graphId + " .js-plotly-plot");
+    if (!bundle || !graph || !window.Plotly) {
+        return false;
+    }
+    var attributes = Object.keys(bundle);
+    var frames = {};
+    attributes.forEach(function (attribute) {
+        frames[attribute] = decodeFrames(bundle[attribute]);
+    });
+    var years = Array.from(decodeArray(bundle[attributes[0]].years));
+    if (!years.length) {
+        return false;
+    }
+
+    // Bornes calculées par une boucle : Math.min.apply dépasse le nombre
+    // maximal d'arguments du moteur sur les grands jeux de trames
+    var cmin = Infinity;
+    var cmax = -Infinity;
+    (frames.z || []).forEach(function (frame) {
+        for (var i = 0; i < frame.length; i++) {
+            if (frame[i] !== null) {
+                cmin = Math.min(cmin, frame[i]);
+                cmax = Math.max(cmax, frame[i]);
+            }
+        }
+    });
+    if (cmin <= cmax) {
+        window.Plotly.relayout(graph, {
+            "coloraxis.cmin": cmin,
+            "coloraxis.cmax": cmax,
+        });
+    }
+
+    function show(t) {
+        var update = {};
+        attributes.forEach(function (attribute) {
+            update[attribute] = [frames[attribute][t]];
+        });
+        window.Plotly.restyle(graph, update, [0]);
+        if (onFrame) {
+            onFrame(years[t]);
+        }
+    }
+
+    var t = 0;
+    var timer = setInterval(function () {
+        if (t < years.length) {
+            show(t++);
+            return;
+        }
+        clearInterval(timer);
+        var selected = years.indexOf(Number(selectedYear));
+        if (selected >= 0) {
+            show(selected);
+        }
+        if (range.length) {
+            window.Plotly.relayout(graph, {"coloraxis.cauto": true});
+        }
+        window.dash_clientside.set_props(buttonId, {disabled: false});
+    }, PLAYBACK_FRAME_MS);
+    return true;
+}
@@ -0,0 +1,53 @@
+// Sections différées (DATAVIZ_LAZY_SECTIONS) : chaque conteneur portant
+// l'attribut data-lazy-store est observé, et son store passe à true quand il
+// approche de la fenêtre, ce qui déclenche les callbacks de la section
+(function () {
+    var observed = new WeakSet();
+
+    function reveal(section) {
+        window.dash_clientside.set_props(section.dataset.lazyStore, {data: true});
+    }
+
+    // Sans IntersectionObserver, les sections sont construites tout de suite
+    var observer =
+        "IntersectionObserver" in window
+            ? new IntersectionObserver(
+                  function (entries) {
+                      entries.forEach(function (entry) {
+                          if (entry.isIntersecting) {
+                              observer.unobserve(entry.target);
+                              reveal(entry.target);
+                          }
+                      });
+                  },
+                  // Commencer le calcul un peu avant que la section n'apparaisse
+                  {rootMargin: "200px"}
+              )
+            : {observe: reveal};
+
+    // Les composants sont rendus par Dash après le chargement du script. La
+    // surveillance du DOM s'arrête une fois toutes les sections de la page
+    // (attribut data-lazy-sections) observées : elle parcourrait sinon la page
+    // à chaque modification, survols des graphiques compris
+    var found = 0;
+
+    function observeSections() {
+        document.querySelectorAll("[data-lazy-store]").forEach(function (section) {
+            if (!observed.has(section)) {
+                observed.add(section);
+                found += 1;
+                observer.observe(section);
+            }
+        });
+        var page = document.querySelector("[data-lazy-sections]");
+        if (page && found >= Number(page.dataset.lazySections)) {
+            mutations.disconnect();
+        }
+    }
+
+    var mutations = new MutationObserver(observeSections);
+    mutations.observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+    });
+})();
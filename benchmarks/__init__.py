@@ -0,0 +1,2 @@
+# Mesures de performance du chargement des données et des callbacks Dash :
+# python -m benchmarks --rows 10000 100000 --output bench.json
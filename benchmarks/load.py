@@ -0,0 +1,504 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.run import _git_commit
+from utils.data import DEMOGRAPHIC_INDICATORS_NOTES_PATH
+
+DEFAULT_CLIENTS = 20
+DEFAULT_DURATION = 30
+
+# Pause d'un utilisateur entre deux actions, en millisecondes
+THINK_MS = (200, 1000)
+
+# Rafale de survols du graphique de dispersion : nombre d'événements et
+# intervalle entre eux, sans attendre les réponses précédentes
+HOVER_STORM_EVENTS = 20
+HOVER_STORM_INTERVAL_MS = 15
+
+# Poids des scénarios dans le mélange joué par chaque client
+SCENARIOS = {"location": 3, "slider": 2, "hover": 2}
+
+# Sections différées, affichées juste après le chargement de la page
+SECTION_STORES = ["pies-section", "map-section", "crossfilter-section"]
+
+UPDATE_PATH = "/_dash-update-component"
+
+
+class HttpError(Exception):
+    pass
+
+
+# Connexion HTTP/1.1 persistante sur les flux asyncio : une requête à la fois
+class HttpConnection:
+    def __init__(self, host, port, ssl=False):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl or None
+        )
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def _read_body(self, headers):
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    return b"".join(chunks)
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+        if "content-length" in headers:
+            return await self.reader.readexactly(int(headers["content-length"]))
+        body = await self.reader.read()
+        headers["connection"] = "close"
+        return body
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            await self._connect()
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+        ]
+        if body is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HttpError("connexion fermée par le serveur")
+        version, status = status_line.decode().split()[:2]
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = b"" if method == "HEAD" else await self._read_body(headers)
+        if headers.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+            self.close()
+        return int(status), data
+
+
+# Connexions d'un client : plusieurs requêtes peuvent être en cours à la fois,
+# comme celles des callbacks déclenchés par une même action
+class HttpPool:
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.ssl = parts.scheme == "https"
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.prefix = parts.path.rstrip("/")
+        self._idle = []
+
+    async def request(self, method, path, payload=None):
+        connection = (
+            self._idle.pop()
+            if self._idle
+            else HttpConnection(self.host, self.port, self.ssl)
+        )
+        body = None if payload is None else json.dumps(payload).encode()
+        try:
+            status, data = await connection.request(method, self.prefix + path, body)
+        except (OSError, asyncio.IncompleteReadError, HttpError, ValueError):
+            connection.close()
+            raise
+        self._idle.append(connection)
+        return status, data
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+# Durées et statuts des requêtes, par sortie de callback
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.counts = defaultdict(lambda: defaultdict(int))
+        self.started = None
+        self.finished = None
+
+    def record(self, name, status, duration):
+        if status == 200:
+            self.latencies[name].append(duration)
+            kind = "ok"
+        elif status == 204:
+            # Pas de mise à jour : section non affichée ou requête dépassée
+            kind = "skipped"
+        else:
+            kind = "errors"
+        self.counts[name][kind] += 1
+
+    def report(self):
+        elapsed = self.finished - self.started
+        outputs = {}
+        for name in sorted(self.counts):
+            counts = self.counts[name]
+            total = sum(counts.values())
+            latencies = [d * 1000 for d in self.latencies[name]]
+            outputs[name] = {
+                "requests": total,
+                "ok": counts["ok"],
+                "skipped": counts["skipped"],
+                "errors": counts["errors"],
+                "error_rate": counts["errors"] / total,
+                "throughput_rps": total / elapsed,
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99),
+                "max_ms": max(latencies) if latencies else None,
+            }
+        total = sum(output["requests"] for output in outputs.values())
+        errors = sum(output["errors"] for output in outputs.values())
+        all_latencies = [d * 1000 for values in self.latencies.values() for d in values]
+        return {
+            "totals": {
+                "requests": total,
+                "errors": errors,
+                "error_rate": errors / total if total else 0.0,
+                "throughput_rps": total / elapsed,
+                "elapsed_s": elapsed,
+                "p50_ms": _percentile(all_latencies, 50),
+                "p95_ms": _percentile(all_latencies, 95),
+                "p99_ms": _percentile(all_latencies, 99),
+            },
+            "outputs": outputs,
+        }
+
+
+# Valeur des propriétés de chaque composant de la mise en page, et choix
+# proposés par les listes et les sliders
+def layout_state(layout):
+    state = {}
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict) or "props" not in node:
+            continue
+        props = node["props"]
+        if "id" in props and isinstance(props["id"], str):
+            for prop, value in props.items():
+                state[(props["id"], prop)] = value
+        for value in props.values():
+            if isinstance(value, (dict, list)):
+                stack.append(value)
+    return state
+
+
+def _option_values(options):
+    return [
+        option["value"] if isinstance(option, dict) else option
+        for option in options or []
+    ]
+
+
+def _slider_years(state, slider):
+    return sorted(int(year) for year in state.get((slider, "marks")) or {})
+
+
+def _parse_output(output):
+    def parse(spec):
+        component, prop = spec.rsplit(".", 1)
+        return {"id": component, "property": prop.split("@")[0]}
+
+    if output.startswith(".."):
+        return [parse(spec) for spec in output.strip(".").split("...")]
+    return parse(output)
+
+
+# Nom d'une sortie dans le rapport : ses composants et propriétés
+def output_name(output):
+    return output.strip(".").replace("...", "+")
+
+
+# Session d'un utilisateur : état des propriétés de la page, et requêtes
+# envoyées aux callbacks serveur dont une entrée change, comme le fait le
+# moteur de rendu de Dash. Aucune requête ne part après l'échéance du test
+class Session:
+    def __init__(self, pool, dependencies, state, recorder, rng, deadline):
+        self.pool = pool
+        self.callbacks = [d for d in dependencies if not d.get("clientside_function")]
+        self.state = dict(state)
+        self.recorder = recorder
+        self.rng = rng
+        self.deadline = deadline
+        self.client = f"load-{rng.getrandbits(32):08x}"
+        self.seq = 0
+        self.locations = _option_values(state.get(("dropdown-selection", "options")))
+
+    def _payload(self, callback, changed):
+        def spec(dependency):
+            key = (dependency["id"], dependency["property"])
+            return {**dependency, "value": self.state.get(key)}
+
+        return {
+            "output": callback["output"],
+            "outputs": _parse_output(callback["output"]),
+            "inputs": [spec(dependency) for dependency in callback["inputs"]],
+            "state": [spec(dependency) for dependency in callback["state"]],
+            "changedPropIds": changed,
+        }
+
+    def expired(self):
+        return time.perf_counter() >= self.deadline
+
+    async def _call(self, callback, changed):
+        if self.expired():
+            return
+        name = output_name(callback["output"])
+        started = time.perf_counter()
+        try:
+            status, _ = await self.pool.request(
+                "POST", UPDATE_PATH, self._payload(callback, changed)
+            )
+        except (OSError, asyncio.IncompleteReadError, HttpError, ValueError):
+            status = None
+        self.recorder.record(name, status, time.perf_counter() - started)
+
+    # Chargement de la page, premier appel des callbacks serveur qui ne
+    # l'empêchent pas, puis affichage des sections différées
+    async def load(self):
+        if self.expired():
+            return
+        started = time.perf_counter()
+        try:
+            status, _ = await self.pool.request("GET", "/")
+        except (OSError, asyncio.IncompleteReadError, HttpError, ValueError):
+            status = None
+        self.recorder.record("page", status, time.perf_counter() - started)
+        await asyncio.gather(
+            *(
+                self._call(callback, [])
+                for callback in self.callbacks
+                if not callback.get("prevent_initial_call")
+            )
+        )
+        for store in SECTION_STORES:
+            if self.state.get((store, "data")) is not True:
+                await self.change(store, "data", True)
+
+    async def change(self, component, prop, value):
+        self.state[(component, prop)] = value
+        changed = f"{component}.{prop}"
+        triggered = [
+            callback
+            for callback in self.callbacks
+            if any(
+                f"{dependency['id']}.{dependency['property']}" == changed
+                for dependency in callback["inputs"]
+            )
+        ]
+        await asyncio.gather(*(self._call(callback, [changed]) for callback in triggered))
+
+    # Pause écourtée à l'échéance, pour que la durée mesurée du test ne compte
+    # pas d'attente après les dernières réponses
+    async def think(self):
+        pause = self.rng.uniform(*THINK_MS) / 1000
+        await asyncio.sleep(max(0.0, min(pause, self.deadline - time.perf_counter())))
+
+    async def location_scenario(self):
+        for location in self.rng.sample(self.locations, min(5, len(self.locations))):
+            if self.expired():
+                return
+            await self.change("dropdown-selection", "value", location)
+            await self.think()
+
+    async def slider_scenario(self):
+        for slider in ("map-year-slider", "crossfilter-year--slider", "pie-year-slider"):
+            for year in _slider_years(self.state, slider):
+                if self.expired():
+                    return
+                await self.change(slider, "value", year)
+            await self.think()
+
+    # Survol rapide du graphique de dispersion : les lieux survolés partent
+    # sans attendre les réponses, numérotés comme par assets/clientside.js
+    async def hover_scenario(self):
+        tasks = []
+        for _ in range(HOVER_STORM_EVENTS):
+            if self.expired():
+                break
+            self.seq += 1
+            hover = {
+                "location": self.rng.choice(self.locations),
+                "client": self.client,
+                "seq": self.seq,
+            }
+            tasks.append(
+                asyncio.ensure_future(self.change("hover-location", "data", hover))
+            )
+            await asyncio.sleep(HOVER_STORM_INTERVAL_MS / 1000)
+        await asyncio.gather(*tasks)
+        await self.think()
+
+
+async def _client(url, dependencies, state, recorder, deadline, seed):
+    rng = random.Random(seed)
+    pool = HttpPool(url)
+    names, weights = zip(*SCENARIOS.items())
+    try:
+        while time.perf_counter() < deadline:
+            session = Session(pool, dependencies, state, recorder, rng, deadline)
+            await session.load()
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(names, weights)[0]
+                await getattr(session, f"{scenario}_scenario")()
+                if rng.random() < 0.1:
+                    # Nouvelle visite de la page
+                    break
+    finally:
+        pool.close()
+
+
+def _get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+async def run_load(url, clients, duration, seed):
+    dependencies = _get_json(url + "/_dash-dependencies")
+    state = layout_state(_get_json(url + "/_dash-layout"))
+    recorder = Recorder()
+    recorder.started = time.perf_counter()
+    deadline = recorder.started + duration
+    await asyncio.gather(
+        *(
+            _client(url, dependencies, state, recorder, deadline, seed + i)
+            for i in range(clients)
+        )
+    )
+    recorder.finished = time.perf_counter()
+    return recorder.report()
+
+
+# Serveur Flask de l'application dans un thread du processus courant
+def start_local_server():
+    from werkzeug.serving import make_server
+
+    import app
+
+    # Sans le journal de chaque requête
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+# Application servie par gunicorn avec le nombre de workers demandé, pour
+# dimensionner le pool
+def start_gunicorn(workers, port, timeout=120):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), DATAVIZ_BIND=f"127.0.0.1:{port}")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:server"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn s'est arrêté au démarrage")
+        try:
+            _get_json(url + "/_dash-dependencies")
+            return url, process.terminate
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("gunicorn n'a pas répondu à temps")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Test de charge : sessions d'utilisateurs rejouées en parallèle"
+    )
+    parser.add_argument("--url", help="application à tester (sinon lancée localement)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="lancer l'application avec gunicorn et ce nombre de workers",
+    )
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats (sinon stdout)")
+    args = parser.parse_args(argv)
+
+    stop = None
+    if args.url:
+        url, target = args.url.rstrip("/"), args.url
+    else:
+        if not os.path.exists(DEMOGRAPHIC_INDICATORS_NOTES_PATH):
+            parser.error("à lancer depuis la racine du projet")
+        if args.workers:
+            url, stop = start_gunicorn(args.workers, args.port)
+            target = f"gunicorn ({args.workers} workers)"
+        else:
+            url, stop = start_local_server()
+            target = "local"
+
+    try:
+        report = asyncio.run(run_load(url, args.clients, args.duration, args.seed))
+    finally:
+        if stop is not None:
+            stop()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "target": target,
+            "clients": args.clients,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "scenarios": SCENARIOS,
+        },
+        **report,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+# Utilisation : python -m benchmarks.load [--url URL | --workers N]
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from dash import _callback
+from plotly.io.json import to_json_plotly
+
+import callbacks
+from benchmarks.synthetic import write_synthetic_csv
+from utils.data import (
+    DEMOGRAPHIC_INDICATORS_NOTES_PATH,
+    load_demographic_indicators,
+    load_demographic_indicators_notes,
+    memory_report,
+    read_demographic_indicators_csv,
+)
+from utils.dataset import Dataset, DatasetHandle
+from utils.serialization import serialize
+
+DEFAULT_ROWS = [10_000, 100_000]
+DEFAULT_REPEAT = 5
+BENCHMARK_YEAR = 2020
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _summary(durations):
+    return {
+        "median_ms": statistics.median(durations) * 1000,
+        "min_ms": min(durations) * 1000,
+        "max_ms": max(durations) * 1000,
+        "repeat": len(durations),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Temps de chargement : analyse du CSV, construction du cache binaire puis
+# relecture du cache dans les différents modes
+def bench_loading(csv_path, cache_dir, repeat):
+    results = {}
+    results["csv_parse"] = _summary(
+        [_timed(read_demographic_indicators_csv, csv_path)[1] for _ in range(repeat)]
+    )
+    _, build = _timed(load_demographic_indicators, csv_path, cache_dir=cache_dir)
+    results["cache_build"] = _summary([build])
+    for name, kwargs in [
+        ("cache_load", {}),
+        ("cache_load_shared", {"shared": True}),
+        ("cache_load_compact", {"profile": "compact"}),
+    ]:
+        # Premier appel hors mesure pour construire le cache du profil
+        load_demographic_indicators(csv_path, cache_dir=cache_dir, **kwargs)
+        results[name] = _summary(
+            [
+                _timed(
+                    load_demographic_indicators, csv_path, cache_dir=cache_dir, **kwargs
+                )[1]
+                for _ in range(repeat)
+            ]
+        )
+    return results
+
+
+# Mémoire occupée par colonne dans les profils par défaut et compact
+# (utils.data.memory_report)
+def bench_memory(csv_path, cache_dir):
+    df = load_demographic_indicators(csv_path, cache_dir=cache_dir)
+    df_compact = load_demographic_indicators(
+        csv_path, cache_dir=cache_dir, profile="compact"
+    )
+    return json.loads(memory_report(df, df_compact).to_json(orient="index"))
+
+
+# Valeurs des entrées des callbacks, choisies dans le jeu de données
+def callback_inputs(df):
+    locations = df["Location"].unique()
+    country = df.loc[df["LocTypeName"] == "Country/Area", "Location"].iloc[0]
+    return {
+        ("dropdown-selection", "value"): locations[0],
+        ("dropdown-time-selection", "value"): BENCHMARK_YEAR,
+        ("variant-selection", "value"): "Medium",
+        ("pie-year-slider", "value"): BENCHMARK_YEAR,
+        ("map-year-slider", "value"): BENCHMARK_YEAR,
+        ("crossfilter-xaxis-column", "value"): "InfantDeaths",
+        ("crossfilter-yaxis-column", "value"): "PopDensity",
+        ("crossfilter-xaxis-type", "value"): "Linear",
+        ("crossfilter-yaxis-type", "value"): "Log",
+        ("crossfilter-year--slider", "value"): BENCHMARK_YEAR,
+        ("hover-location", "data"): {"location": country},
+        # Sections différées considérées comme affichées
+        ("pies-section", "data"): True,
+        ("map-section", "data"): True,
+        ("crossfilter-section", "data"): True,
+    }
+
+
+# Corps des callbacks enregistrés par register_callbacks, débarrassés des
+# décorateurs (Dash, cache de figures) pour être mesurés isolément
+def registered_callbacks():
+    for output, entry in _callback.GLOBAL_CALLBACK_MAP.items():
+        if "callback" not in entry:
+            # Callback exécuté dans le navigateur
+            continue
+        func = inspect.unwrap(entry["callback"])
+        yield output, func, entry["inputs"] + entry.get("state", [])
+
+
+# Temps de construction de chaque callback et de sérialisation compacte de sa
+# sortie (utils.serialization)
+def bench_callbacks(df, df_notes, repeat):
+    _callback.GLOBAL_CALLBACK_MAP.clear()
+    _callback.GLOBAL_CALLBACK_LIST.clear()
+    callbacks.register_callbacks(DatasetHandle(Dataset("benchmark", df, df_notes)))
+    values = callback_inputs(df)
+    # Sans cache de figures : chaque appel mesure la construction complète,
+    # y compris celle des sorties calculées par des fonctions mémoïsées, qui
+    # renvoient alors les figures avant leur sérialisation compacte
+    callbacks.figure_cache.bypass = True
+
+    results = {}
+    for output, func, dependencies in registered_callbacks():
+        args = [values.get((dep["id"], dep["property"])) for dep in dependencies]
+        # Premier appel hors mesure (constructions paresseuses, imports)
+        func(*args)
+        build_times, serialize_times = [], []
+        for _ in range(repeat):
+            result, duration = _timed(func, *args)
+            build_times.append(duration)
+            payload, duration = _timed(serialize, result)
+            serialize_times.append(duration)
+        results[func.__name__] = {
+            "output": output,
+            "build": _summary(build_times),
+            "serialize": _summary(serialize_times),
+            "bytes": len(payload),
+            # Taille sans la sérialisation compacte, pour comparaison
+            "plain_bytes": len(to_json_plotly(result)),
+        }
+    return results
+
+
+def run(rows_list, repeat, workdir):
+    df_notes = load_demographic_indicators_notes()
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "repeat": repeat,
+        },
+        "runs": [],
+    }
+    for n_rows in rows_list:
+        csv_path = os.path.join(workdir, f"demographic_indicators_{n_rows}.csv")
+        cache_dir = os.path.join(workdir, f"cache_{n_rows}")
+        actual_rows = write_synthetic_csv(csv_path, n_rows)
+        loading = bench_loading(csv_path, cache_dir, repeat)
+        df = load_demographic_indicators(csv_path, cache_dir=cache_dir)
+        report["runs"].append(
+            {
+                "rows": actual_rows,
+                "csv_bytes": os.path.getsize(csv_path),
+                "loading": loading,
+                "memory": bench_memory(csv_path, cache_dir),
+                "callbacks": bench_callbacks(df, df_notes, repeat),
+            }
+        )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mesure du chargement des données et des callbacks Dash"
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="fichier JSON de résultats (sinon stdout)")
+    parser.add_argument("--workdir", help="répertoire des fichiers synthétiques")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(DEMOGRAPHIC_INDICATORS_NOTES_PATH):
+        parser.error("à lancer depuis la racine du projet")
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        report = run(args.rows, args.repeat, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            report = run(args.rows, args.repeat, workdir)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
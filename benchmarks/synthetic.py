@@ -0,0 +1,112 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.data import DEMOGRAPHIC_INDICATORS_DTYPES
+
+FIRST_YEAR = 1950
+LAST_YEAR = 2100
+
+# Première année de projection : les variantes autres que Medium ne couvrent
+# que les années suivantes, comme dans les fichiers WPP
+FIRST_PROJECTION_YEAR = 2024
+
+VARIANTS = [("Medium", 2), ("High", 3), ("Low", 4)]
+
+# Part des localisations qui sont des agrégats régionaux
+REGION_SHARE = 0.05
+
+COUNTRY_TYPE = ("Country/Area", 4)
+REGION_TYPE = ("Geographic region", 5)
+WORLD_TYPE = ("World", 1)
+
+
+def _rows_per_location():
+    history = FIRST_PROJECTION_YEAR - FIRST_YEAR
+    projection = LAST_YEAR - FIRST_PROJECTION_YEAR + 1
+    return history + projection * len(VARIANTS)
+
+
+def _iso3(i):
+    letters = []
+    for _ in range(3):
+        i, r = divmod(i, 26)
+        letters.append(chr(ord("A") + r))
+    return "".join(reversed(letters))
+
+
+# Jeu de données synthétique ayant les colonnes et les types du fichier WPP :
+# une localisation "World", quelques régions et des pays rattachés à ces
+# régions, sur 1950-2100 pour la variante Medium et sur les années de
+# projection pour les autres variantes. Le nombre de lignes est arrondi au
+# multiple supérieur du nombre de lignes par localisation
+def synthetic_demographic_indicators(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_locations = max(2, math.ceil(n_rows / _rows_per_location()))
+    n_regions = max(1, int(n_locations * REGION_SHARE))
+
+    # Description des localisations
+    loc_ids = np.arange(1, n_locations + 1)
+    is_region = np.zeros(n_locations, dtype=bool)
+    is_region[1 : n_regions + 1] = True
+    parent_ids = np.where(
+        is_region, loc_ids[0], loc_ids[1 + np.arange(n_locations) % n_regions]
+    )
+    parent_ids[0] = 0
+    names = np.array(
+        ["World"]
+        + [
+            f"Region {i:05d}" if region else f"Country {i:07d}"
+            for i, region in enumerate(is_region[1:], start=1)
+        ],
+        dtype=object,
+    )
+    type_names = np.where(is_region, REGION_TYPE[0], COUNTRY_TYPE[0]).astype(object)
+    type_ids = np.where(is_region, REGION_TYPE[1], COUNTRY_TYPE[1])
+    type_names[0], type_ids[0] = WORLD_TYPE
+    iso3 = np.array(
+        [None if i == 0 or region else _iso3(i) for i, region in enumerate(is_region)],
+        dtype=object,
+    )
+
+    # Lignes (localisation, variante, année)
+    blocks = []
+    for variant, var_id in VARIANTS:
+        first = FIRST_YEAR if variant == "Medium" else FIRST_PROJECTION_YEAR
+        years = np.arange(first, LAST_YEAR + 1)
+        loc = np.repeat(np.arange(n_locations), len(years))
+        blocks.append((loc, np.tile(years, n_locations), variant, var_id))
+
+    loc = np.concatenate([b[0] for b in blocks])
+    data = {
+        "SortOrder": loc + 1,
+        "LocID": loc_ids[loc],
+        "Notes": np.full(len(loc), None, dtype=object),
+        "ISO3_code": iso3[loc],
+        "ISO2_code": np.array([c[:2] if c else None for c in iso3], dtype=object)[loc],
+        "SDMX_code": loc_ids.astype(str).astype(object)[loc],
+        "LocTypeID": type_ids[loc],
+        "LocTypeName": type_names[loc],
+        "ParentID": parent_ids[loc],
+        "Location": names[loc],
+        "VarID": np.concatenate([np.full(len(b[0]), b[3]) for b in blocks]),
+        "Variant": np.concatenate(
+            [np.full(len(b[0]), b[2], dtype=object) for b in blocks]
+        ),
+        "Time": np.concatenate([b[1] for b in blocks]),
+    }
+    for col, kind in DEMOGRAPHIC_INDICATORS_DTYPES.items():
+        if kind is float:
+            data[col] = rng.lognormal(mean=3.0, sigma=1.0, size=len(loc))
+
+    df = pd.DataFrame(data, columns=list(DEMOGRAPHIC_INDICATORS_DTYPES))
+    # Valeurs manquantes ponctuelles, comme dans les fichiers réels
+    df.loc[rng.random(len(df)) < 0.01, "DoublingTime"] = np.nan
+    return df
+
+
+def write_synthetic_csv(path, n_rows, seed=0):
+    df = synthetic_demographic_indicators(n_rows, seed)
+    df.to_csv(path, index=False)
+    return len(df)
@@ -1,393 +1,387 @@
-from dash import html, dcc, callback, Output, Input
-import dash_mantine_components as dmc
-from dash_iconify import DashIconify
+import functools
+
+from dash import (
+    callback,
+    clientside_callback,
+    ctx,
+    no_update,
+    ClientsideFunction,
+    Input,
+    Output,
+    Patch,
+    State,
+)
+from dash.exceptions import MissingCallbackContextException, PreventUpdate
 import plotly.express as px
 
-# Liste des indicateurs pertinents pour les camemberts
-relevant_columns = ["PopSexRatio", "PopDensity", "MedianAgePop"]
+from figures import TOP_K, map_figure, pie_charts, relevant_columns
+from layouts import DEFAULT_HOVER_LOCATION, LAZY_SECTIONS
+from utils.coalescing import LatestRequests
+from utils.data import (
+    DEFAULT_DECIMALS,
+    DemographicCube,
+    indicator_decimals,
+    indicator_registry,
+)
+from utils.figure_cache import create_figure_cache
+from utils.instrumentation import phase
+from utils.ranking import TopKRanking
+from utils.serialization import delta_encode
+
+# Cache LRU des figures, partagé par tous les callbacks du worker
+figure_cache = create_figure_cache()
+
+# Dernier survol du graphique de dispersion reçu de chaque onglet
+hover_requests = LatestRequests()
+
+# Indicateurs des séries d'une localisation, envoyées au navigateur pour les
+# chiffres clés : même ordre que key_stats dans assets/clientside.js
+LOCATION_COLUMNS = [
+    "TPopulation1Jan",
+    "Births",
+    "Deaths",
+    "LExMale",
+    "LExFemale",
+    "NetMigrations",
+]
+
+
+# Modification d'une figure déjà affichée : seules les valeurs de ses traces
+# sont remplacées, la mise en page et le reste des traces sont conservés
+def trace_patch(values):
+    patch = Patch()
+    for (trace, attribute), array in values.items():
+        patch["data"][trace][attribute] = array
+    return patch
+
+
+# Composants dont une propriété a déclenché le callback en cours ; vide au
+# chargement initial ou hors d'une requête Dash (benchmarks)
+def _triggered_ids():
+    try:
+        return set(ctx.triggered_prop_ids.values())
+    except MissingCallbackContextException:
+        return set()
+
+
+# Structures dérivées d'une version des données (utils.dataset), construites
+# à sa première utilisation et abandonnées avec elle lors d'un rechargement
+class DatasetViews:
+    def __init__(self, dataset):
+        self.version = dataset.version
+        self.df = dataset.df
+        self.df_notes = dataset.df_notes
+        self.artifacts = dataset.artifacts
+        self.store = dataset.store
+
+        # Index des lignes par localisation et par année pour chaque variante
+        # de projection
+        self.indexes = dataset.indexes()
+        self.default_variant = next(iter(self.indexes))
+
+        # Indicateurs des notes présents dans la table (DATAVIZ_COLUMNS)
+        self.indicators = [
+            indicator for indicator in self.df_notes["Indicator"] if indicator in self.df
+        ]
+        self.decimals = indicator_decimals(self.df_notes)
+        self.registry = indicator_registry(self.df_notes)
+
+        # Caches propres à la version, libérés avec elle
+        self._cube = functools.lru_cache(maxsize=None)(self._build_cube)
+        self._ranking = functools.lru_cache(maxsize=None)(self._build_ranking)
+        self._location_slice = functools.lru_cache(maxsize=256)(
+            self._build_location_slice
+        )
+        self._location_series = functools.lru_cache(maxsize=256)(
+            self._build_location_series
+        )
+
+    def resolve_variant(self, selected_variant):
+        if selected_variant in self.indexes:
+            return selected_variant
+        return self.default_variant
+
+    def variant_index(self, selected_variant):
+        return self.indexes[self.resolve_variant(selected_variant)]
+
+    # Cube localisation × année × indicateur de chaque variante, arrondi à la
+    # précision de chaque indicateur et projeté en mémoire depuis le cache
+    # binaire, partagé par les workers
+    def _build_cube(self, variant):
+        return DemographicCube.cached(
+            self.store,
+            self.df,
+            self.indicators,
+            self.indexes[variant].rows,
+            self.decimals,
+        )
+
+    def cube(self, selected_variant):
+        return self._cube(self.resolve_variant(selected_variant))
+
+    # Classement des pays pour chaque année et chaque indicateur des notes
+    def _build_ranking(self, variant):
+        return TopKRanking(self._cube(variant), TOP_K)
+
+    def ranking(self, selected_variant):
+        return self._ranking(self.resolve_variant(selected_variant))
+
+    # Sortie précalculée par precompute.py pour une année du slider, si disponible
+    def precomputed(self, kind, selected_variant, selected_year):
+        if self.artifacts is None:
+            return None
+        return self.artifacts.get(
+            kind, self.resolve_variant(selected_variant), selected_year
+        )
+
+    # Séries d'une localisation utilisées par les graphiques et les chiffres
+    # clés, extraites une seule fois par couple (variante, localisation)
+    def _build_location_slice(self, variant, location):
+        with phase("filter"):
+            return self._cube(variant).location_data(location, LOCATION_COLUMNS)
+
+    def location_slice(self, selected_variant, selected_location):
+        return self._location_slice(
+            self.resolve_variant(selected_variant), selected_location
+        )
+
+    # Valeurs d'un indicateur pour toutes les années, encodées pour les
+    # animations (voir delta_encode)
+    def frames(self, indicator, selected_variant):
+        cube = self.cube(selected_variant)
+        return delta_encode(
+            cube.year_matrix(indicator),
+            self.decimals.get(indicator, DEFAULT_DECIMALS),
+            cube.years,
+        )
+
+    # Séries de tous les indicateurs d'une localisation, partagées par les deux
+    # séries temporelles du lieu survolé
+    def _build_location_series(self, variant, location):
+        return self._cube(variant).location_data(location, self.indicators)
+
+    def location_series(self, selected_variant, selected_location):
+        return self._location_series(
+            self.resolve_variant(selected_variant), selected_location
+        )
+
+    # Titre d'un indicateur avec son unité, lus dans le registre des notes
+    def indicator_title(self, indicator):
+        info = self.registry[indicator]
+        return f"{info['name']} ({info['unit']})" if info["unit"] else info["name"]
+
 
+# Les callbacks lisent la version courante des données (datasets, un
+# utils.dataset.DatasetHandle) au début de chaque requête et la passent aux
+# fonctions mémoïsées : la version fait partie des clés du cache de figures
+def register_callbacks(datasets):
+    def current_views():
+        return datasets.current().derived("callbacks", DatasetViews)
 
-def register_callbacks(df, df_notes):
-    # Mise à jour du graphique de l'évolution de la population en fonction de la localisation
+    # Sorties dépendant de la localisation sélectionnée, renvoyées en une seule
+    # réponse : changer de localisation ne coûte qu'un aller-retour et une
+    # extraction des séries du lieu. Seules les sorties dont une entrée a
+    # changé sont recalculées, les autres sont laissées telles quelles.
+    # Les séries du lieu sont envoyées au navigateur (location-data), qui en
+    # tire les chiffres clés de chaque année sans rappeler le serveur
     @callback(
         Output("population-evolution", "figure"),
+        Output("death-birth-evolution", "figure"),
+        Output("location-data", "data"),
+        Output("pie-charts-container", "children"),
         Input("dropdown-selection", "value"),
+        Input("pie-year-slider", "value"),
+        Input("variant-selection", "value"),
+        Input("pies-section", "data"),
     )
-    def update_bubble_chart(selected_location):
+    def update_location(
+        selected_location, selected_year, selected_variant, pies_visible
+    ):
+        views = current_views()
+        triggered = _triggered_ids()
+
+        def changed(*ids):
+            return not triggered or any(component in triggered for component in ids)
+
+        outputs = [no_update] * 4
+        if changed("dropdown-selection", "variant-selection"):
+            outputs[0] = update_bubble_chart(
+                views, selected_location, selected_variant
+            )
+            outputs[1] = update_population_evolution(
+                views, selected_location, selected_variant
+            )
+            outputs[2] = location_data(views, selected_location, selected_variant)
+        # Les camemberts attendent que leur section soit visible
+        if pies_visible and changed(
+            "dropdown-selection", "pie-year-slider", "variant-selection", "pies-section"
+        ):
+            outputs[3] = update_pie_charts(
+                views, selected_location, selected_year, selected_variant
+            )
+        return outputs
+
+    # Séries de la localisation au format JSON, pour les chiffres clés
+    def location_data(views, selected_location, selected_variant):
+        return {
+            column: values.tolist()
+            for column, values in views.location_slice(
+                selected_variant, selected_location
+            ).items()
+        }
+
+    # Graphique de l'évolution de la population en fonction de la localisation
+    @figure_cache.memoize("update_bubble_chart")
+    def update_bubble_chart(views, selected_location, selected_variant):
         return px.line(
-            df[df["Location"] == selected_location],
+            views.location_slice(selected_variant, selected_location),
             x="Time",
             y="TPopulation1Jan",
             hover_data={"Time"},
             title=f"Evolution de la population de 1950 à 2100 (projection)",
         )
 
-    # Mise à jour du champ de texte affichant le pays sélectionné
-    @callback(
-        Output("selected-country-heading", "children"),
-        [Input("dropdown-selection", "value")],
-    )
-    def update_selected_country_heading(selected_country):
-        return f"Pays sélectionné : {selected_country}"
-
-    # Mise à jour du champ de texte affichant la date sélectionnée
-    @callback(
-        Output("selected-time-heading", "children"),
-        [Input("dropdown-time-selection", "value")],
-    )
-    def update_selected_time_heading(selected_date):
-        return f"Date sélectionnée : {selected_date}"
-
-    # Mise à jour du graphique de l'évolution des naissances et des décès en fonction de la localisation
-    @callback(
-        Output("death-birth-evolution", "figure"),
-        Input("dropdown-selection", "value"),
-    )
-    def update_population_evolution(selected_location):
-        dff = df[df["Location"] == selected_location]
+    # Graphique de l'évolution des naissances et des décès en fonction de la localisation
+    @figure_cache.memoize("update_population_evolution")
+    def update_population_evolution(views, selected_location, selected_variant):
         fig = px.line(
-            dff,
+            views.location_slice(selected_variant, selected_location),
             x="Time",
             y=["Deaths", "Births"],
             title="Evolution du rapport entre les naissances et les décès",
         )
         return fig
 
-    # Mise à jour des camemberts en fonction de la localisation
-    @callback(
-        Output("pie-charts-container", "children"),
-        [Input("dropdown-selection", "value"), Input("pie-year-slider", "value")],
-    )
-    def update_pie_charts(selected_location, selected_year):
-        pie_charts_children = []
-
-        if selected_location == "World" or selected_location is None:
-            for col in relevant_columns:
-                # Sélectionner les valeurs pour l'année sélectionnée
-                df_year = df[df["Time"] == selected_year]
-                # Sélectionner les 5 premières lignes pour chaque colonne
-                sorted_values = df_year.sort_values(by=col, ascending=False).head(5)
-                pie_fig = px.pie(
-                    sorted_values,
-                    names="Location",
-                    values=col,
-                    title=f"Top 5 des pays par {col} en {selected_year}",
-                    labels={
-                        "Location": "Pays",
-                        col: "Valeur",
-                    },  # Définir les étiquettes
-                )
-                pie_fig.update_traces(textinfo="value")  # Afficher les valeurs brutes
-                pie_charts_children.append(dcc.Graph(figure=pie_fig))
-
+    # Camemberts en fonction de la localisation
+    @figure_cache.memoize("update_pie_charts")
+    def update_pie_charts(views, selected_location, selected_year, selected_variant):
         # Retourne une liste vide si un pays est sélectionné
-        return pie_charts_children
+        if selected_location != "World" and selected_location is not None:
+            return []
 
-    # Mise à jour du titre de la ventilation spatiale en fonction de l'année sélectionnée dans le slider
-    @callback(
-        Output("map-year-title", "children"),
-        Input("map-year-slider", "value"),
-    )
-    def update_map_year_title(selected_year):
-        return f"Ventilation spatiale de l'age médian dans le monde en {selected_year}"
+        children = views.precomputed("pies", selected_variant, selected_year)
+        if children is not None:
+            return children
+
+        with phase("filter"):
+            ranking = views.ranking(selected_variant)
+            tops = ranking.tops(selected_year, relevant_columns)
+        return pie_charts(tops, selected_year)
 
-    # Mise à jour de la carte du monde en fonction de l'année
+    # Mise à jour de la carte du monde en fonction de l'année, une fois sa
+    # section visible
     @callback(
         Output("map-content", "figure"),
-        [Input("dropdown-selection", "value"), Input("map-year-slider", "value")],
+        Input("map-section", "data"),
+        Input("map-year-slider", "value"),
+        Input("variant-selection", "value"),
+        prevent_initial_call=LAZY_SECTIONS,
     )
-    def update_map(selected_location, selected_year):
-        if selected_year is not None:
-            df_year = df[df["Time"] == selected_year]
-            fig = px.choropleth(
-                df_year,
-                locations="ISO3_code",
-                color="MedianAgePop",
-                hover_name="Location",
-                color_continuous_scale=px.colors.sequential.Plasma,
+    def update_map(visible, selected_year, selected_variant):
+        if not visible:
+            raise PreventUpdate
+        views = current_views()
+        # Seule l'année a changé : la carte affichée ne reçoit que ses valeurs
+        if _triggered_ids() == {"map-year-slider"} and selected_year is not None:
+            return map_patch(views, selected_year, selected_variant)
+        return map_content(views, selected_year, selected_variant)
+
+    # Valeurs de la carte pour une année, dans l'ordre des localisations des
+    # figures complètes (coupe du cube de la variante)
+    @figure_cache.memoize("map_patch")
+    def map_patch(views, selected_year, selected_variant):
+        with phase("filter"):
+            data = views.cube(selected_variant).year_data(
+                selected_year, ["MedianAgePop"]
             )
-            return fig
+        return trace_patch({(0, "z"): data["MedianAgePop"]})
+
+    @figure_cache.memoize("update_map")
+    def map_content(views, selected_year, selected_variant):
+        if selected_year is not None:
+            fig = views.precomputed("map", selected_variant, selected_year)
+            if fig is not None:
+                return fig
+            with phase("filter"):
+                data = views.cube(selected_variant).year_data(
+                    selected_year, ["MedianAgePop"]
+                )
+            return map_figure(data)
         else:
             # Si aucune année n'est sélectionnée, afficher la carte avec les données de l'année actuelle par défaut
-            fig = px.choropleth(
-                df,
-                locations="ISO3_code",
-                color="MedianAgePop",
-                hover_name="Location",
-                color_continuous_scale=px.colors.sequential.Plasma,
-            )
+            fig = map_figure(views.variant_index(selected_variant).frame())
         return fig
 
-    # Mise à jour des chiffres clés en fonction de la localisation et de la date
-    @callback(
-        Output("key-stats", "children"),
-        [Input("dropdown-selection", "value"), Input("dropdown-time-selection", "value")],
-    )
-    def update_key_stats(selected_location, selected_date):
-        if selected_location is None:
-            return html.Div(
-                [
-                    html.H2("Chiffres clés"),
-                    html.P(
-                        "Sélectionnez une localisation pour afficher les chiffres clés",
-                        style={"font-size": "1.2em"},
-                    ),
-                ],
-                style={"text-align": "center"},
-            )
-
-        dff = df[(df["Location"] == selected_location) & (df["Time"] == selected_date)]
-        total_population = dff["TPopulation1Jan"].sum()
-        total_births = dff["Births"].sum()
-        total_deaths = dff["Deaths"].sum()
-        migration_rate = dff["NetMigrations"].mean()
-        LExMale = dff["LExMale"].mean()
-        LExFemale = dff["LExFemale"].mean()
-
-        return html.Div(
-            [
-                html.H2(
-                    "Chiffres clés",
-                    style={"text-align": "center"},
-                ),
-                dmc.SimpleGrid(
-                    cols=3,
-                    children=[
-                        html.Div(
-                            [
-                                DashIconify(
-                                    icon="raphael:people",
-                                    width=50,
-                                    style={"margin-right": "10px"},
-                                ),
-                                html.Div(
-                                    [
-                                        html.H3(
-                                            "Nombre total d'habitants",
-                                            style={
-                                                "margin-bottom": "5px",
-                                                "text-align": "center",
-                                                "font-size": "1.2em",
-                                            },
-                                        ),
-                                        html.P(
-                                            round(total_population),
-                                            style={
-                                                "font-weight": "bold",
-                                                "font-size": "1.1em",
-                                                "text-align": "center",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flex-direction": "column",
-                                    },
-                                ),
-                            ],
-                            style={"display": "flex", "align-items": "center"},
-                        ),
-                        html.Div(
-                            [
-                                DashIconify(
-                                    icon="noto-v1:baby-bottle",
-                                    width=50,
-                                    style={"margin-right": "10px"},
-                                ),
-                                html.Div(
-                                    [
-                                        html.H3(
-                                            "Nombre total de naissances",
-                                            style={
-                                                "margin-bottom": "5px",
-                                                "text-align": "center",
-                                                "font-size": "1.2em",
-                                            },
-                                        ),
-                                        html.P(
-                                            round(total_births),
-                                            style={
-                                                "font-weight": "bold",
-                                                "font-size": "1.1em",
-                                                "text-align": "center",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flex-direction": "column",
-                                    },
-                                ),
-                            ],
-                            style={
-                                "display": "flex",
-                                "align-items": "center",
-                            },
-                        ),
-                        html.Div(
-                            [
-                                DashIconify(
-                                    icon="healthicons:death-alt2-outline",
-                                    width=50,
-                                    style={"margin-right": "10px"},
-                                ),
-                                html.Div(
-                                    [
-                                        html.H3(
-                                            "Nombre total de décès",
-                                            style={
-                                                "margin-bottom": "5px",
-                                                "text-align": "center",
-                                                "font-size": "1.2em",
-                                            },
-                                        ),
-                                        html.P(
-                                            round(total_deaths),
-                                            style={
-                                                "font-weight": "bold",
-                                                "font-size": "1.1em",
-                                                "text-align": "center",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flex-direction": "column",
-                                    },
-                                ),
-                            ],
-                            style={"display": "flex", "align-items": "center"},
-                        ),
-                        html.Div(
-                            [
-                                DashIconify(
-                                    icon="fluent-emoji:male-sign",
-                                    width=50,
-                                    style={"margin-right": "10px"},
-                                ),
-                                html.Div(
-                                    [
-                                        html.H3(
-                                            "Espérance de vie moyenne des homme",
-                                            style={
-                                                "margin-bottom": "5px",
-                                                "text-align": "center",
-                                                "font-size": "1.2em",
-                                            },
-                                        ),
-                                        html.P(
-                                            round(LExMale),
-                                            style={
-                                                "font-weight": "bold",
-                                                "font-size": "1.1em",
-                                                "text-align": "center",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flex-direction": "column",
-                                    },
-                                ),
-                            ],
-                            style={"display": "flex", "align-items": "center"},
-                        ),
-                        html.Div(
-                            [
-                                DashIconify(
-                                    icon="fluent-emoji:female-sign",
-                                    width=50,
-                                    style={"margin-right": "10px"},
-                                ),
-                                html.Div(
-                                    [
-                                        html.H3(
-                                            "Espérance de vie moyenne des femmes",
-                                            style={
-                                                "margin-bottom": "5px",
-                                                "text-align": "center",
-                                                "font-size": "1.2em",
-                                            },
-                                        ),
-                                        html.P(
-                                            round(LExFemale),
-                                            style={
-                                                "font-weight": "bold",
-                                                "font-size": "1.1em",
-                                                "text-align": "center",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flex-direction": "column",
-                                    },
-                                ),
-                            ],
-                            style={"display": "flex", "align-items": "center"},
-                        ),
-                        html.Div(
-                            [
-                                DashIconify(
-                                    icon="gis:earth-euro-africa-o",
-                                    width=50,
-                                    style={"margin-right": "10px"},
-                                ),
-                                html.Div(
-                                    [
-                                        html.H3(
-                                            "Taux de migration",
-                                            style={
-                                                "margin-bottom": "5px",
-                                                "text-align": "center",
-                                                "font-size": "1.2em",
-                                            },
-                                        ),
-                                        html.P(
-                                            round(migration_rate),
-                                            style={
-                                                "font-weight": "bold",
-                                                "font-size": "1.1em",
-                                                "text-align": "center",
-                                            },
-                                        ),
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flex-direction": "column",
-                                    },
-                                ),
-                            ],
-                            style={ "display": "flex", "align-items": "center", "justify-content": "center"},
-                        ),
-                    ],
-                ),
-            ],
-            style={"padding": "20px"},
-        )
-
+    # Graphique de dispersion et séries temporelles, une fois leur section
+    # visible
     @callback(
         Output("crossfilter-indicator-scatter", "figure"),
+        Input("crossfilter-section", "data"),
         Input("crossfilter-xaxis-column", "value"),
         Input("crossfilter-yaxis-column", "value"),
-        Input("crossfilter-xaxis-type", "value"),
-        Input("crossfilter-yaxis-type", "value"),
         Input("crossfilter-year--slider", "value"),
+        Input("variant-selection", "value"),
+        State("crossfilter-xaxis-type", "value"),
+        State("crossfilter-yaxis-type", "value"),
+        prevent_initial_call=LAZY_SECTIONS,
     )
     def update_graph(
-        xaxis_column_name, yaxis_column_name, xaxis_type, yaxis_type, year_value
+        visible,
+        xaxis_column_name,
+        yaxis_column_name,
+        year_value,
+        selected_variant,
+        xaxis_type,
+        yaxis_type,
     ):
-        dff = df[df["Time"] == year_value]
+        if not visible:
+            raise PreventUpdate
+        views = current_views()
+        # Seule l'année a changé : les points gardent leurs lieux et leurs axes
+        if _triggered_ids() == {"crossfilter-year--slider"}:
+            return scatter_patch(
+                views, xaxis_column_name, yaxis_column_name, year_value, selected_variant
+            )
+        return scatter_figure(
+            views,
+            xaxis_column_name,
+            yaxis_column_name,
+            year_value,
+            selected_variant,
+            xaxis_type,
+            yaxis_type,
+        )
 
-        # Agréger les données par année et par lieu
-        dff_aggregated = (
-            dff.groupby("Location")
-            .agg({xaxis_column_name: "first", yaxis_column_name: "first"})
-            .reset_index()
+    @figure_cache.memoize("scatter_patch")
+    def scatter_patch(
+        views, xaxis_column_name, yaxis_column_name, year_value, selected_variant
+    ):
+        with phase("filter"):
+            data = views.cube(selected_variant).year_data(
+                year_value, [xaxis_column_name, yaxis_column_name]
+            )
+        return trace_patch(
+            {(0, "x"): data[xaxis_column_name], (0, "y"): data[yaxis_column_name]}
         )
 
+    @figure_cache.memoize("update_graph")
+    def scatter_figure(
+        views,
+        xaxis_column_name,
+        yaxis_column_name,
+        year_value,
+        selected_variant,
+        xaxis_type,
+        yaxis_type,
+    ):
+        # Coupe de l'année dans le cube : une valeur par lieu et par indicateur
+        with phase("filter"):
+            data = views.cube(selected_variant).year_data(
+                year_value, [xaxis_column_name, yaxis_column_name]
+            )
+
         fig = px.scatter(
-            dff_aggregated,
+            data,
             x=xaxis_column_name,
             y=yaxis_column_name,
             hover_name="Location",
@@ -407,33 +401,114 @@ def register_callbacks(df, df_notes):
 
         return fig
 
+    # Animations de la carte et du graphique de dispersion : les images de
+    # toutes les années sont envoyées en une réponse et jouées dans le
+    # navigateur (play_frames dans assets/clientside.js)
     @callback(
-        Output("x-time-series", "figure"),
-        Input("crossfilter-indicator-scatter", "hoverData"),
-        Input("crossfilter-xaxis-column", "value"),
-        Input("crossfilter-xaxis-type", "value"),
+        Output("map-frames", "data"),
+        Input("map-play", "n_clicks"),
+        State("variant-selection", "value"),
+        prevent_initial_call=True,
     )
-    def update_x_timeseries(hoverData, xaxis_column_name, axis_type):
-        return create_time_series(hoverData, xaxis_column_name, axis_type)
+    def play_map(n_clicks, selected_variant):
+        return {
+            "z": indicator_frames(current_views(), "MedianAgePop", selected_variant)
+        }
 
     @callback(
+        Output("crossfilter-frames", "data"),
+        Input("crossfilter-play", "n_clicks"),
+        State("crossfilter-xaxis-column", "value"),
+        State("crossfilter-yaxis-column", "value"),
+        State("variant-selection", "value"),
+        prevent_initial_call=True,
+    )
+    def play_scatter(n_clicks, xaxis_column_name, yaxis_column_name, selected_variant):
+        views = current_views()
+        return {
+            "x": indicator_frames(views, xaxis_column_name, selected_variant),
+            "y": indicator_frames(views, yaxis_column_name, selected_variant),
+        }
+
+    # Images d'un indicateur, mises en cache par couple (indicateur, variante)
+    @figure_cache.memoize("indicator_frames")
+    def indicator_frames(views, indicator, selected_variant):
+        with phase("filter"):
+            return views.frames(indicator, selected_variant)
+
+    # Séries temporelles du lieu survolé, pour les deux indicateurs, en un
+    # seul callback. Le navigateur ne transmet le lieu survolé qu'une fois la
+    # souris arrêtée (hover_location dans assets/clientside.js) ; une requête
+    # dépassée par un survol plus récent du même onglet est abandonnée
+    @callback(
+        Output("x-time-series", "figure"),
         Output("y-time-series", "figure"),
-        Input("crossfilter-indicator-scatter", "hoverData"),
+        Input("crossfilter-section", "data"),
+        Input("hover-location", "data"),
+        Input("crossfilter-xaxis-column", "value"),
         Input("crossfilter-yaxis-column", "value"),
-        Input("crossfilter-yaxis-type", "value"),
+        Input("variant-selection", "value"),
+        State("crossfilter-xaxis-type", "value"),
+        State("crossfilter-yaxis-type", "value"),
+        prevent_initial_call=LAZY_SECTIONS,
     )
-    def update_y_timeseries(hoverData, yaxis_column_name, axis_type):
-        return create_time_series(hoverData, yaxis_column_name, axis_type)
-
-    def create_time_series(hoverData, column_name, axis_type):
-        country_name = hoverData["points"][0]["hovertext"]
-        dff = df[df["Location"] == country_name]
-        label = df_notes.loc[
-            df_notes["Indicator"] == column_name, "IndicatorName"
-        ].values[0]
+    def update_timeseries(
+        visible,
+        hover,
+        xaxis_column_name,
+        yaxis_column_name,
+        selected_variant,
+        xaxis_type,
+        yaxis_type,
+    ):
+        if not visible:
+            raise PreventUpdate
+        # Store vidé (None) : séries du lieu par défaut
+        hover = hover or {"location": DEFAULT_HOVER_LOCATION}
+        client, seq = hover.get("client"), hover.get("seq", 0)
+        if not hover_requests.begin(client, seq):
+            raise PreventUpdate
+
+        views = current_views()
+        triggered = _triggered_ids()
+        outputs = [no_update] * 2
+        series = [
+            ("crossfilter-xaxis-column", xaxis_column_name, xaxis_type),
+            ("crossfilter-yaxis-column", yaxis_column_name, yaxis_type),
+        ]
+        for i, (column_input, column_name, axis_type) in enumerate(series):
+            # Le changement d'indicateur de l'autre axe ne concerne pas la série
+            if triggered and triggered <= {
+                other for other, _, _ in series if other != column_input
+            }:
+                continue
+            if hover_requests.superseded(client, seq):
+                raise PreventUpdate
+            outputs[i] = create_time_series(
+                views,
+                hover.get("location", DEFAULT_HOVER_LOCATION),
+                column_name,
+                axis_type,
+                selected_variant,
+            )
+        return outputs
+
+    # Les deux séries partagent leurs entrées du cache : un même indicateur
+    # peut être affiché en abscisse comme en ordonnée
+    @figure_cache.memoize("create_time_series")
+    def create_time_series(
+        views, country_name, column_name, axis_type, selected_variant
+    ):
+        with phase("filter"):
+            series = views.location_series(selected_variant, country_name)
+            label = views.indicator_title(column_name)
         title = "<b>{}</b><br>{}".format(country_name, label)
 
-        fig = px.scatter(dff, x="Time", y=column_name)
+        fig = px.scatter(
+            {"Time": series["Time"], column_name: series[column_name]},
+            x="Time",
+            y=column_name,
+        )
         fig.update_traces(mode="lines+markers")
         fig.update_xaxes(showgrid=False, title="Temps")
         fig.update_yaxes(title=label, type="linear" if axis_type == "Linear" else "log")
@@ -450,12 +525,89 @@ def register_callbacks(df, df_notes):
         )
         return fig
 
-    # Définissez votre callback pour contrôler la visibilité des éléments en fonction de la valeur de dropdown-selection
-    @callback(
+    register_clientside_callbacks()
+
+
+# Callbacks exécutés dans le navigateur (assets/clientside.js) : textes,
+# visibilité des camemberts, chiffres clés et type des axes
+def register_clientside_callbacks():
+    def clientside(function_name):
+        return ClientsideFunction(namespace="dataviz", function_name=function_name)
+
+    clientside_callback(
+        clientside("selected_country_heading"),
+        Output("selected-country-heading", "children"),
+        Input("dropdown-selection", "value"),
+    )
+    clientside_callback(
+        clientside("selected_time_heading"),
+        Output("selected-time-heading", "children"),
+        Input("dropdown-time-selection", "value"),
+    )
+    clientside_callback(
+        clientside("map_year_title"),
+        Output("map-year-title", "children"),
+        Input("map-year-slider", "value"),
+    )
+    clientside_callback(
+        clientside("hide_elements"),
         Output("pie-container", "style"),
-        Input("dropdown-selection", "value")
+        Input("dropdown-selection", "value"),
+    )
+    clientside_callback(
+        clientside("key_stats_placeholder"),
+        Output("key-stats-grid", "style"),
+        Output("key-stats-placeholder", "style"),
+        Input("dropdown-selection", "value"),
+    )
+    clientside_callback(
+        clientside("key_stats"),
+        [
+            Output(f"key-stat-{column}", "children")
+            for column in LOCATION_COLUMNS
+        ],
+        Input("dropdown-time-selection", "value"),
+        Input("location-data", "data"),
     )
-    def hide_elements(selected_location):
-        # Masquer les éléments si l'option sélectionnée n'est pas 'World'
-        if selected_location != 'World':
-            return {'display': 'none'}
\ No newline at end of file
+
+    # Lecture des animations, sans aller-retour avec le serveur
+    for graph, frames, slider in (
+        ("map", "map-frames", "map-year-slider"),
+        ("crossfilter", "crossfilter-frames", "crossfilter-year--slider"),
+    ):
+        clientside_callback(
+            clientside(f"play_{graph}"),
+            Output(f"{graph}-play", "disabled"),
+            Input(frames, "data"),
+            State(slider, "value"),
+            prevent_initial_call=True,
+        )
+
+    clientside_callback(
+        clientside("hover_location"),
+        Output("hover-location", "data"),
+        Input("crossfilter-indicator-scatter", "hoverData"),
+        prevent_initial_call=True,
+    )
+
+    # Le type des axes ne fait que modifier la figure déjà affichée ; le
+    # serveur le lit en State lorsqu'il reconstruit la figure
+    clientside_callback(
+        clientside("scatter_axis_types"),
+        Output("crossfilter-indicator-scatter", "figure", allow_duplicate=True),
+        Input("crossfilter-xaxis-type", "value"),
+        Input("crossfilter-yaxis-type", "value"),
+        State("crossfilter-indicator-scatter", "figure"),
+        prevent_initial_call=True,
+    )
+    for series, axis_type in (
+        ("x-time-series", "crossfilter-xaxis-type"),
+        ("y-time-series", "crossfilter-yaxis-type"),
+    ):
+        clientside_callback(
+            clientside("timeseries_axis_type"),
+            Output(series, "figure", allow_duplicate=True),
+            Input(axis_type, "value"),
+            State(series, "figure"),
+            prevent_initial_call=True,
+        )
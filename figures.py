@@ -0,0 +1,40 @@
+from dash import dcc
+import plotly.express as px
+
+# Liste des indicateurs pertinents pour les camemberts
+relevant_columns = ["PopSexRatio", "PopDensity", "MedianAgePop"]
+
+# Nombre de pays affichés dans chaque camembert
+TOP_K = 5
+
+
+# Camembert du top des pays pour un indicateur
+def pie_chart(top, col, selected_year):
+    pie_fig = px.pie(
+        top,
+        names="Location",
+        values=col,
+        title=f"Top {TOP_K} des pays par {col} en {selected_year}",
+        labels={
+            "Location": "Pays",
+            col: "Valeur",
+        },  # Définir les étiquettes
+    )
+    pie_fig.update_traces(textinfo="value")  # Afficher les valeurs brutes
+    return dcc.Graph(figure=pie_fig)
+
+
+# tops associe à chaque indicateur son top des pays (voir TopKRanking)
+def pie_charts(tops, selected_year):
+    return [pie_chart(tops[col], col, selected_year) for col in relevant_columns]
+
+
+# Carte du monde de l'age médian
+def map_figure(df_year):
+    return px.choropleth(
+        df_year,
+        locations="ISO3_code",
+        color="MedianAgePop",
+        hover_name="Location",
+        color_continuous_scale=px.colors.sequential.Plasma,
+    )
@@ -0,0 +1,23 @@
+# Configuration gunicorn : gunicorn -c gunicorn.conf.py app:server
+import os
+
+# Les workers partagent les colonnes projetées en mémoire depuis le cache ; la
+# variable doit être définie avant l'import de utils.data, qui la lit
+os.environ.setdefault("DATAVIZ_SHARED_DATA", "1")
+
+from utils.data import ensure_demographic_indicators_cache  # noqa: E402
+
+bind = os.environ.get("DATAVIZ_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+
+
+def on_starting(server):
+    # Construire le cache une seule fois, avant le fork des workers, pour
+    # qu'ils ne fassent que le projeter en mémoire
+    ensure_demographic_indicators_cache()
+
+    # Précalculer les cartes et camemberts des sliders avant le fork
+    if os.environ.get("DATAVIZ_PRECOMPUTE") == "1":
+        import precompute
+
+        precompute.main()
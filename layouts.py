@@ -1,13 +1,45 @@
+import os
+
 from dash import html, dcc, dash_table
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 import plotly.express as px
 
+from utils.data import DATA_VARIANT, list_variants
+
 image_path = "assets/introduction.jpg"
 
+# Sections sous la ligne de flottaison (camemberts, carte, dispersion)
+# construites seulement quand elles deviennent visibles
+LAZY_SECTIONS = os.environ.get("DATAVIZ_LAZY_SECTIONS", "1") == "1"
+
+# Lieu des séries temporelles tant qu'aucun point n'a été survolé
+DEFAULT_HOVER_LOCATION = "World"
+
+# Stores des sections différées, dans l'ordre de la page
+LAZY_SECTION_STORES = ["pies-section", "map-section", "crossfilter-section"]
+
+
+# Store indiquant si une section a été affichée ; passé à True par
+# assets/lazy_sections.js quand la section entre dans la fenêtre
+def section_store(store_id):
+    return dcc.Store(id=store_id, data=not LAZY_SECTIONS)
+
+
+# Attribut observé par assets/lazy_sections.js sur le conteneur de la section
+def section_attributes(store_id):
+    return {"data-lazy-store": store_id} if LAZY_SECTIONS else {}
+
+
+# Nombre de sections différées de la page, lu par assets/lazy_sections.js pour
+# cesser de surveiller le DOM une fois toutes ses sections trouvées
+def page_attributes():
+    return {"data-lazy-sections": len(LAZY_SECTION_STORES)} if LAZY_SECTIONS else {}
+
 
 # Définir la mise en page de l'application
 def home_page(df, df_notes):
+    variants = list_variants(df)
     layout = html.Div(
         id="main-content",  # Ajouter un ID pour cibler cet élément dans le callback
         children=[
@@ -147,8 +179,270 @@ def home_page(df, df_notes):
                     "text-align": "center"
                 },  # Centrer le contenu horizontalement
             ),
-            # Statistiques clés
-            html.Div(id="key-stats"),
+            # Liste déroulante pour sélectionner la variante de projection
+            html.Div(
+                [
+                    html.H3(
+                        "Variante de projection",
+                        style={"text-align": "center", "padding": 15},
+                    ),
+                    dcc.Dropdown(
+                        clearable=False,
+                        options=[
+                            {"label": variant, "value": variant}
+                            for variant in variants
+                        ],
+                        # La variante chargée (DATAVIZ_VARIANT), sinon la
+                        # variante Medium, est sélectionnée par défaut
+                        value=DATA_VARIANT or (variants[0] if variants else None),
+                        id="variant-selection",
+                        style={
+                            "width": "300px",
+                            "font-size": "16px",
+                            "font-family": "Arial, sans-serif",
+                            "color": "#333",  # Couleur du texte
+                            "background-color": "#f7f7f7",  # Couleur de fond
+                            "border-radius": "8px",  # Coins arrondis
+                            "border": "1px solid #ccc",  # Bordure
+                            "box-shadow": "0 2px 4px rgba(0,0,0,0.1)",  # Ombre
+                            "margin": "0 auto",  # Centrer le dropdown horizontalement
+                        },
+                    ),
+                ],
+                style={"text-align": "center"},
+            ),
+            # Statistiques clés, remplies dans le navigateur (assets/clientside.js)
+            dcc.Store(id="location-data"),
+            html.Div(
+                [
+                    html.H2(
+                        "Chiffres clés",
+                        style={"text-align": "center"},
+                    ),
+                    dmc.SimpleGrid(
+                        cols=3,
+                        id="key-stats-grid",
+                        children=[
+                            html.Div(
+                                [
+                                    DashIconify(
+                                        icon="raphael:people",
+                                        width=50,
+                                        style={"margin-right": "10px"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H3(
+                                                "Nombre total d'habitants",
+                                                style={
+                                                    "margin-bottom": "5px",
+                                                    "text-align": "center",
+                                                    "font-size": "1.2em",
+                                                },
+                                            ),
+                                            html.P(
+                                                id="key-stat-TPopulation1Jan",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "font-size": "1.1em",
+                                                    "text-align": "center",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flex-direction": "column",
+                                        },
+                                    ),
+                                ],
+                                style={"display": "flex", "align-items": "center"},
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(
+                                        icon="noto-v1:baby-bottle",
+                                        width=50,
+                                        style={"margin-right": "10px"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H3(
+                                                "Nombre total de naissances",
+                                                style={
+                                                    "margin-bottom": "5px",
+                                                    "text-align": "center",
+                                                    "font-size": "1.2em",
+                                                },
+                                            ),
+                                            html.P(
+                                                id="key-stat-Births",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "font-size": "1.1em",
+                                                    "text-align": "center",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flex-direction": "column",
+                                        },
+                                    ),
+                                ],
+                                style={
+                                    "display": "flex",
+                                    "align-items": "center",
+                                },
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(
+                                        icon="healthicons:death-alt2-outline",
+                                        width=50,
+                                        style={"margin-right": "10px"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H3(
+                                                "Nombre total de décès",
+                                                style={
+                                                    "margin-bottom": "5px",
+                                                    "text-align": "center",
+                                                    "font-size": "1.2em",
+                                                },
+                                            ),
+                                            html.P(
+                                                id="key-stat-Deaths",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "font-size": "1.1em",
+                                                    "text-align": "center",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flex-direction": "column",
+                                        },
+                                    ),
+                                ],
+                                style={"display": "flex", "align-items": "center"},
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(
+                                        icon="fluent-emoji:male-sign",
+                                        width=50,
+                                        style={"margin-right": "10px"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H3(
+                                                "Espérance de vie moyenne des homme",
+                                                style={
+                                                    "margin-bottom": "5px",
+                                                    "text-align": "center",
+                                                    "font-size": "1.2em",
+                                                },
+                                            ),
+                                            html.P(
+                                                id="key-stat-LExMale",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "font-size": "1.1em",
+                                                    "text-align": "center",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flex-direction": "column",
+                                        },
+                                    ),
+                                ],
+                                style={"display": "flex", "align-items": "center"},
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(
+                                        icon="fluent-emoji:female-sign",
+                                        width=50,
+                                        style={"margin-right": "10px"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H3(
+                                                "Espérance de vie moyenne des femmes",
+                                                style={
+                                                    "margin-bottom": "5px",
+                                                    "text-align": "center",
+                                                    "font-size": "1.2em",
+                                                },
+                                            ),
+                                            html.P(
+                                                id="key-stat-LExFemale",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "font-size": "1.1em",
+                                                    "text-align": "center",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flex-direction": "column",
+                                        },
+                                    ),
+                                ],
+                                style={"display": "flex", "align-items": "center"},
+                            ),
+                            html.Div(
+                                [
+                                    DashIconify(
+                                        icon="gis:earth-euro-africa-o",
+                                        width=50,
+                                        style={"margin-right": "10px"},
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.H3(
+                                                "Taux de migration",
+                                                style={
+                                                    "margin-bottom": "5px",
+                                                    "text-align": "center",
+                                                    "font-size": "1.2em",
+                                                },
+                                            ),
+                                            html.P(
+                                                id="key-stat-NetMigrations",
+                                                style={
+                                                    "font-weight": "bold",
+                                                    "font-size": "1.1em",
+                                                    "text-align": "center",
+                                                },
+                                            ),
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flex-direction": "column",
+                                        },
+                                    ),
+                                ],
+                                style={ "display": "flex", "align-items": "center", "justify-content": "center"},
+                            ),
+                        ],
+                    ),
+                    # Message affiché à la place des chiffres clés tant
+                    # qu'aucune localisation n'est sélectionnée
+                    html.P(
+                        "Sélectionnez une localisation pour afficher les chiffres clés",
+                        id="key-stats-placeholder",
+                        style={"display": "none"},
+                    ),
+                ],
+                id="key-stats",
+                style={"padding": "20px"},
+            ),
             # Graphiques de tendance sur l'évolution de la population
             html.Div(
                 children=[
@@ -167,8 +461,10 @@ def home_page(df, df_notes):
                 ]
             ),
             # Représentation du top pays des principaux indicateurs
+            section_store("pies-section"),
             html.Div(
                 id="pie-container",
+                **section_attributes("pies-section"),
                 children=[
                     html.H2(
                         "Représentation du top pays des principaux indicateurs",
@@ -195,34 +491,45 @@ def home_page(df, df_notes):
                     ),
                 ]
             ),
-            # Carte mondiale de la ventilation spatiale de l'age médian
-            html.H2(
-                "Ventilation spatiale de l'age médian dans le monde en ",
-                id="map-year-title",
-                style={"text-align": "center", "padding": 15},
-            ),
-            # Sélection de l'année pour la carte mondiale
+            # Carte mondiale et son slider
+            section_store("map-section"),
             html.Div(
                 [
-                    dcc.Slider(
-                        id="map-year-slider",
-                        min=df["Time"].min(),
-                        max=df["Time"].max(),
-                        step=10,  # Afficher tous les 10 ans d'intervalle
-                        value=2024,  # Année par défaut
-                        marks={
-                            str(year): str(year)
-                            for year in range(
-                                df["Time"].min(), df["Time"].max() + 1, 10
-                            )
-                        },
+                    # Carte mondiale de la ventilation spatiale de l'age médian
+                    html.H2(
+                        "Ventilation spatiale de l'age médian dans le monde en ",
+                        id="map-year-title",
+                        style={"text-align": "center", "padding": 15},
                     ),
+                    # Sélection de l'année pour la carte mondiale
+                    html.Div(
+                        [
+                            dcc.Slider(
+                                id="map-year-slider",
+                                min=df["Time"].min(),
+                                max=df["Time"].max(),
+                                step=10,  # Afficher tous les 10 ans d'intervalle
+                                value=2024,  # Année par défaut
+                                marks={
+                                    str(year): str(year)
+                                    for year in range(
+                                        df["Time"].min(), df["Time"].max() + 1, 10
+                                    )
+                                },
+                            ),
+                            # Animation de toutes les années
+                            html.Button("Lecture", id="map-play"),
+                            dcc.Store(id="map-frames"),
+                        ],
+                        style={"width": "90%", "margin": "0 auto", "margin-bottom": "20px"},
+                    ),
+                    # Carte mondiale
+                    dcc.Graph(id="map-content"),
                 ],
-                style={"width": "90%", "margin": "0 auto", "margin-bottom": "20px"},
+                **section_attributes("map-section"),
             ),
-            # Carte mondiale
-            dcc.Graph(id="map-content"),
             # Graphiques de dispersion et de tendance
+            section_store("crossfilter-section"),
             html.Div(
                 [
                     # Gauche: Graphique de dispersion
@@ -235,6 +542,8 @@ def home_page(df, df_notes):
                                     for value, label in zip(
                                         df_notes["Indicator"], df_notes["IndicatorName"]
                                     )
+                                    # Seulement les indicateurs chargés
+                                    if value in df
                                 ],
                                 value="InfantDeaths",
                                 id="crossfilter-xaxis-column",
@@ -256,23 +565,37 @@ def home_page(df, df_notes):
                                 [
                                     dcc.Graph(
                                         id="crossfilter-indicator-scatter",
-                                        hoverData={"points": [{"hovertext": "World"}]},
-                                    )
+                                        hoverData={
+                                            "points": [
+                                                {"hovertext": DEFAULT_HOVER_LOCATION}
+                                            ]
+                                        },
+                                    ),
+                                    # Lieu survolé transmis au serveur
+                                    dcc.Store(
+                                        id="hover-location",
+                                        data={"location": DEFAULT_HOVER_LOCATION},
+                                    ),
                                 ],
                             ),
                             # Slider pour sélectionner l'année
                             html.Div(
-                                dcc.Slider(
-                                    min=df["Time"].min(),
-                                    max=df["Time"].max(),
-                                    step=None,
-                                    id="crossfilter-year--slider",
-                                    value=2024,
-                                    marks={
-                                        str(year): str(year)
-                                        for year in range(df["Time"].min(), df["Time"].max(), 10)
-                                    },
-                                ),
+                                [
+                                    dcc.Slider(
+                                        min=df["Time"].min(),
+                                        max=df["Time"].max(),
+                                        step=None,
+                                        id="crossfilter-year--slider",
+                                        value=2024,
+                                        marks={
+                                            str(year): str(year)
+                                            for year in range(df["Time"].min(), df["Time"].max(), 10)
+                                        },
+                                    ),
+                                    # Animation de toutes les années
+                                    html.Button("Lecture", id="crossfilter-play"),
+                                    dcc.Store(id="crossfilter-frames"),
+                                ]
                             ),
                         ],
                         style={"width": "49%", "display": "inline-block"},
@@ -287,6 +610,8 @@ def home_page(df, df_notes):
                                     for value, label in zip(
                                         df_notes["Indicator"], df_notes["IndicatorName"]
                                     )
+                                    # Seulement les indicateurs chargés
+                                    if value in df
                                 ],
                                 value="PopDensity",
                                 id="crossfilter-yaxis-column",
@@ -319,7 +644,9 @@ def home_page(df, df_notes):
                     ),
                 ],
                 style={"padding": "10px 5px"},
+                **section_attributes("crossfilter-section"),
             ),            
         ],
+        **page_attributes(),
     )
     return layout
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from figures import TOP_K, map_figure, pie_charts, relevant_columns
+from utils.data import (
+    DATA_COLUMNS,
+    DATA_PROFILE,
+    DATA_VARIANT,
+    DATA_YEARS,
+    DemographicCube,
+    ensure_demographic_indicators_cache,
+    indicator_decimals,
+    load_demographic_indicators,
+    load_demographic_indicators_notes,
+    selected_columns,
+    variant_partitions,
+)
+from utils.ranking import TopKRanking
+from utils.serialization import serialize
+from utils.store import LOCK_FILE, file_lock
+
+ARTIFACT_DIR = "data/artifacts"
+
+# Version du format des artefacts : l'incrémenter invalide ceux déjà construits
+ARTIFACT_FORMAT = 4
+
+# Construire les artefacts manquants au démarrage de l'application
+PRECOMPUTE_ON_STARTUP = os.environ.get("DATAVIZ_PRECOMPUTE") == "1"
+
+# Pas des sliders de la carte et des camemberts
+SLIDER_STEP = 10
+
+MANIFEST_FILE = "manifest.json"
+
+
+# Années proposées par les sliders de la carte et des camemberts
+def slider_years(df, step=SLIDER_STEP):
+    return list(range(int(df["Time"].min()), int(df["Time"].max()) + 1, step))
+
+
+# La version dépend des données sources (empreinte du cache binaire), du
+# profil, de la variante, des colonnes et des années chargés ainsi que des
+# indicateurs précalculés
+def artifact_version(
+    profile=DATA_PROFILE, variant=DATA_VARIANT, columns=DATA_COLUMNS, years=DATA_YEARS
+):
+    source = os.path.basename(
+        ensure_demographic_indicators_cache(
+            profile=profile, variant=variant, columns=columns, years=years
+        )
+    )
+    key = json.dumps(
+        [
+            ARTIFACT_FORMAT,
+            source,
+            profile,
+            variant,
+            selected_columns(columns),
+            years,
+            relevant_columns,
+        ]
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _artifact_path(directory, kind, variant, year):
+    return os.path.join(directory, kind, str(variant), f"{year}.json")
+
+
+def _write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(payload)
+
+
+# Précalcule, pour chaque variante et chaque année des sliders, la carte du
+# monde, les camemberts et le top des pays de chaque indicateur de
+# relevant_columns, dans un répertoire publié d'un bloc une fois complet
+def build_artifacts(df, directory):
+    root = os.path.dirname(directory)
+    os.makedirs(root, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=root, prefix=".build-")
+    try:
+        years = slider_years(df)
+        decimals = indicator_decimals(load_demographic_indicators_notes())
+        partitions = variant_partitions(df) or {None: None}
+        for variant, rows in partitions.items():
+            cube = DemographicCube.from_frame(df, relevant_columns, rows)
+            cube.round(decimals)
+            ranking = TopKRanking(cube, TOP_K)
+            for year in years:
+                tops = ranking.tops(year, relevant_columns)
+                _write_json(
+                    _artifact_path(tmp_path, "top", variant, year),
+                    serialize(
+                        {col: top.to_dict("records") for col, top in tops.items()}
+                    ),
+                )
+                _write_json(
+                    _artifact_path(tmp_path, "map", variant, year),
+                    serialize(map_figure(cube.year_data(year, ["MedianAgePop"]))),
+                )
+                _write_json(
+                    _artifact_path(tmp_path, "pies", variant, year),
+                    serialize(pie_charts(tops, year)),
+                )
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "variants": [str(variant) for variant in partitions],
+            "years": years,
+            "columns": relevant_columns,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+        os.chmod(tmp_path, 0o755)
+        try:
+            os.rename(tmp_path, directory)
+        except OSError:
+            # Un autre processus a publié la même version entre-temps
+            pass
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    # Supprimer les versions précédentes
+    for entry in os.listdir(root):
+        if entry != os.path.basename(directory) and not entry.startswith("."):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+# Accès en lecture aux artefacts d'une version, relus une seule fois par
+# processus puis gardés en mémoire
+class Artifacts:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self._loaded = {}
+
+    def get(self, kind, variant, year):
+        key = (kind, str(variant), year)
+        if key not in self._loaded:
+            try:
+                with open(_artifact_path(self.directory, kind, variant, year)) as f:
+                    self._loaded[key] = json.load(f)
+            except (OSError, ValueError):
+                self._loaded[key] = None
+        return self._loaded[key]
+
+
+# Artefacts de la version courante des données, construits au besoin ; None
+# s'ils n'existent pas et que la construction n'est pas demandée. Un seul
+# processus les construit, les autres attendent qu'ils soient publiés
+def load_artifacts(df, build=PRECOMPUTE_ON_STARTUP, artifact_dir=ARTIFACT_DIR):
+    directory = os.path.join(artifact_dir, artifact_version())
+    manifest = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest):
+        if not build:
+            return None
+        os.makedirs(artifact_dir, exist_ok=True)
+        with file_lock(os.path.join(artifact_dir, LOCK_FILE)):
+            if not os.path.exists(manifest):
+                build_artifacts(df, directory)
+    return Artifacts(directory)
+
+
+def main():
+    df = load_demographic_indicators()
+    directory = os.path.join(ARTIFACT_DIR, artifact_version())
+    build_artifacts(df, directory)
+    print(directory)
+
+
+# Utilisation : python precompute.py
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import threading
+from collections import OrderedDict
+
+# Nombre de clients dont le dernier numéro de requête est conservé
+COALESCING_CLIENTS = 4096
+
+
+# Numéro de la dernière requête reçue de chaque client (un onglet du
+# navigateur) pour un flux d'événements fréquents comme le survol : une
+# requête dépassée par une plus récente du même client n'est plus utile et
+# peut être abandonnée. Le suivi est propre à chaque processus
+class LatestRequests:
+    def __init__(self, max_clients=COALESCING_CLIENTS):
+        self.max_clients = max_clients
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    # Enregistre une requête ; False si une requête plus récente du même
+    # client a déjà été reçue
+    def begin(self, client, seq):
+        if client is None:
+            return True
+        with self._lock:
+            latest = self._latest.get(client)
+            if latest is not None and seq < latest:
+                self.dropped += 1
+                return False
+            self._latest[client] = seq
+            self._latest.move_to_end(client)
+            while len(self._latest) > self.max_clients:
+                self._latest.popitem(last=False)
+        return True
+
+    # Vrai si une requête plus récente du même client est arrivée depuis
+    def superseded(self, client, seq):
+        if client is None:
+            return False
+        with self._lock:
+            if self._latest.get(client, seq) > seq:
+                self.dropped += 1
+                return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._latest), "dropped": self.dropped}
@@ -1,86 +1,478 @@
+import functools
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
+from utils.iso_codes import add_iso_codes
+from utils.ranking import COUNTRY_TYPE
+from utils.store import LOCK_FILE, cached_frame, ensure_store, file_lock, write_array
 
-def load_demographic_indicators():
-    df = pd.read_csv(
-        "data/demographic_indicators.csv",
-        dtype={
-            "SortOrder": int,
-            "LocID": int,
-            "Notes": str,
-            "ISO3_code": str,
-            "ISO2_code": str,
-            "SDMX_code": str,
-            "LocTypeID": int,
-            "LocTypeName": str,
-            "ParentID": int,
-            "Location": str,
-            "VarID": int,
-            "Variant": str,
-            "Time": int,
-            "TPopulation1Jan": float,
-            "TPopulation1July": float,
-            "TPopulationMale1July": float,
-            "TPopulationFemale1July": float,
-            "PopDensity": float,
-            "PopSexRatio": float,
-            "MedianAgePop": float,
-            "NatChange": float,
-            "NatChangeRT": float,
-            "PopChange": float,
-            "PopGrowthRate": float,
-            "DoublingTime": float,
-            "Births": float,
-            "Births1519": float,
-            "CBR": float,
-            "TFR": float,
-            "NRR": float,
-            "MAC": float,
-            "SRB": float,
-            "Deaths": float,
-            "DeathsMale": float,
-            "DeathsFemale": float,
-            "CDR": float,
-            "LEx": float,
-            "LExMale": float,
-            "LExFemale": float,
-            "LE15": float,
-            "LE15Male": float,
-            "LE15Female": float,
-            "LE65": float,
-            "LE65Male": float,
-            "LE65Female": float,
-            "LE80": float,
-            "LE80Male": float,
-            "LE80Female": float,
-            "InfantDeaths": float,
-            "IMR": float,
-            "LBsurvivingAge1": float,
-            "Under5Deaths": float,
-            "Q5": float,
-            "Q0040": float,
-            "Q0040Male": float,
-            "Q0040Female": float,
-            "Q0060": float,
-            "Q0060Male": float,
-            "Q0060Female": float,
-            "Q1550": float,
-            "Q1550Male": float,
-            "Q1550Female": float,
-            "Q1560": float,
-            "Q1560Male": float,
-            "Q1560Female": float,
-            "NetMigrations": float,
-            "CNMR": float,
-        },
+DEMOGRAPHIC_INDICATORS_PATH = "data/demographic_indicators.csv"
+DEMOGRAPHIC_INDICATORS_NOTES_PATH = "data/demographic_indicators_notes.csv"
+CACHE_DIR = "data/cache"
+
+# Mode partagé : les colonnes numériques sont des vues sur les fichiers du cache
+# projetés en mémoire, que tous les workers gunicorn partagent sans copie, et
+# les colonnes texte restent codées (catégories) au lieu d'être décodées en
+# objets Python dans chaque processus
+SHARED_DATA = os.environ.get("DATAVIZ_SHARED_DATA") == "1"
+
+# Profil de chargement : "default" (types du CSV) ou "compact" (voir
+# to_compact_profile)
+DATA_PROFILE = os.environ.get("DATAVIZ_DATA_PROFILE", "default")
+
+# Variante de projection à charger ("Medium", "High", "Low"...) ; toutes les
+# variantes sont chargées si elle n'est pas précisée
+DATA_VARIANT = os.environ.get("DATAVIZ_VARIANT") or None
+
+# Colonnes à charger (liste séparée par des virgules) et années à retenir
+# ("1950-2050") ; les colonnes clés et celles du tableau de bord sont toujours
+# chargées (voir selected_columns)
+DATA_COLUMNS = (
+    os.environ["DATAVIZ_COLUMNS"].split(",")
+    if os.environ.get("DATAVIZ_COLUMNS")
+    else None
+)
+DATA_YEARS = (
+    tuple(int(year) for year in os.environ["DATAVIZ_YEARS"].split("-"))
+    if os.environ.get("DATAVIZ_YEARS")
+    else None
+)
+
+# Lecture en flux : le CSV est lu par morceaux de ce nombre de lignes, filtrés
+# dès leur lecture et écrits directement dans le cache, pour les fichiers trop
+# gros pour être chargés d'un bloc (0 : lecture d'un bloc)
+INGEST_CHUNK_ROWS = int(os.environ.get("DATAVIZ_INGEST_CHUNK_ROWS", 0))
+
+# Variante de référence : c'est la seule qui contient les estimations passées
+BASE_VARIANT = "Medium"
+
+# Types des colonnes du fichier des indicateurs démographiques
+DEMOGRAPHIC_INDICATORS_DTYPES = {
+    "SortOrder": int,
+    "LocID": int,
+    "Notes": str,
+    "ISO3_code": str,
+    "ISO2_code": str,
+    "SDMX_code": str,
+    "LocTypeID": int,
+    "LocTypeName": str,
+    "ParentID": int,
+    "Location": str,
+    "VarID": int,
+    "Variant": str,
+    "Time": int,
+    "TPopulation1Jan": float,
+    "TPopulation1July": float,
+    "TPopulationMale1July": float,
+    "TPopulationFemale1July": float,
+    "PopDensity": float,
+    "PopSexRatio": float,
+    "MedianAgePop": float,
+    "NatChange": float,
+    "NatChangeRT": float,
+    "PopChange": float,
+    "PopGrowthRate": float,
+    "DoublingTime": float,
+    "Births": float,
+    "Births1519": float,
+    "CBR": float,
+    "TFR": float,
+    "NRR": float,
+    "MAC": float,
+    "SRB": float,
+    "Deaths": float,
+    "DeathsMale": float,
+    "DeathsFemale": float,
+    "CDR": float,
+    "LEx": float,
+    "LExMale": float,
+    "LExFemale": float,
+    "LE15": float,
+    "LE15Male": float,
+    "LE15Female": float,
+    "LE65": float,
+    "LE65Male": float,
+    "LE65Female": float,
+    "LE80": float,
+    "LE80Male": float,
+    "LE80Female": float,
+    "InfantDeaths": float,
+    "IMR": float,
+    "LBsurvivingAge1": float,
+    "Under5Deaths": float,
+    "Q5": float,
+    "Q0040": float,
+    "Q0040Male": float,
+    "Q0040Female": float,
+    "Q0060": float,
+    "Q0060Male": float,
+    "Q0060Female": float,
+    "Q1550": float,
+    "Q1550Male": float,
+    "Q1550Female": float,
+    "Q1560": float,
+    "Q1560Male": float,
+    "Q1560Female": float,
+    "NetMigrations": float,
+    "CNMR": float,
+}
+
+
+# Colonnes nécessaires aux filtres, au calcul des codes ISO et à la hiérarchie
+# des localisations
+KEY_COLUMNS = ["LocID", "LocTypeName", "ParentID", "Location", "Variant", "Time"]
+
+# Colonnes affichées par le tableau de bord quels que soient les indicateurs
+# choisis : carte (layouts.py, figures.map_figure), chiffres clés
+# (callbacks.LOCATION_COLUMNS), camemberts (figures.relevant_columns) et axes
+# par défaut du graphique de dispersion
+DASHBOARD_COLUMNS = [
+    "ISO3_code",
+    "TPopulation1Jan",
+    "Births",
+    "Deaths",
+    "LExMale",
+    "LExFemale",
+    "NetMigrations",
+    "PopSexRatio",
+    "PopDensity",
+    "MedianAgePop",
+    "InfantDeaths",
+]
+
+
+# Colonnes texte dont les valeurs se répètent d'une ligne à l'autre
+COMPACT_CATEGORY_COLUMNS = [
+    "Notes",
+    "ISO3_code",
+    "ISO2_code",
+    "SDMX_code",
+    "LocTypeName",
+    "Location",
+    "Variant",
+]
+
+# Colonnes entières dont les valeurs tiennent sur 16 bits
+COMPACT_INT16_COLUMNS = ["Time", "VarID", "LocTypeID"]
+
+# Unité des effectifs, qui restent en float64 : en float32, une population
+# mondiale en milliers perdrait plusieurs centaines de personnes
+COUNT_UNIT = "thousands"
+
+
+# Nombre de décimales significatives des indicateurs selon leur unité : les
+# effectifs en milliers au millier près d'une personne, les âges et les taux
+# pour 1 000 au dixième
+UNIT_DECIMALS = {
+    COUNT_UNIT: 3,
+    "years": 1,
+    "percentage": 2,
+    "persons per square km": 1,
+    "males per 100 females": 1,
+    "males per 100 female births": 1,
+    "live births per woman": 2,
+    "surviving daughters per woman": 2,
+}
+
+# Taux pour 1 000 (natalité, mortalité, quotients...) et unités inconnues
+RATE_DECIMALS = 1
+DEFAULT_DECIMALS = 3
+
+
+# Avec chunksize, retourne un lecteur qui itère sur des morceaux du fichier
+def read_demographic_indicators_csv(
+    path=DEMOGRAPHIC_INDICATORS_PATH, usecols=None, chunksize=None, nrows=None
+):
+    return pd.read_csv(
+        path,
+        dtype=DEMOGRAPHIC_INDICATORS_DTYPES,
+        usecols=usecols,
+        chunksize=chunksize,
+        nrows=nrows,
+    )
+
+
+# Colonnes effectivement chargées pour une sélection : les colonnes demandées,
+# complétées des colonnes clés et de celles du tableau de bord
+def selected_columns(columns):
+    if columns is None:
+        return None
+    return sorted(set(columns) | set(KEY_COLUMNS) | set(DASHBOARD_COLUMNS))
+
+
+# Projection des colonnes à la lecture du CSV
+def _usecols(columns):
+    if columns is None:
+        return None
+    keep = set(selected_columns(columns))
+    return lambda column: column in keep
+
+
+# Indicateurs de type taux, ratio, âge ou densité, pour lesquels la précision
+# du float32 (7 chiffres significatifs) suffit
+def compact_float32_columns(df_notes):
+    units = df_notes["Unit"].str.strip()
+    return df_notes.loc[units != COUNT_UNIT, "Indicator"].tolist()
+
+
+# Nombre de décimales affichées pour chaque indicateur, d'après son unité
+def indicator_decimals(df_notes):
+    decimals = {}
+    for indicator, unit in zip(df_notes["Indicator"], df_notes["Unit"].str.strip()):
+        if unit in UNIT_DECIMALS:
+            decimals[indicator] = UNIT_DECIMALS[unit]
+        elif "per 1,000" in unit:
+            decimals[indicator] = RATE_DECIMALS
+        else:
+            decimals[indicator] = DEFAULT_DECIMALS
+    return decimals
+
+
+# Nom et unité de chaque indicateur, lus une fois dans les notes
+def indicator_registry(df_notes):
+    return {
+        indicator: {"name": name, "unit": unit}
+        for indicator, name, unit in zip(
+            df_notes["Indicator"],
+            df_notes["IndicatorName"],
+            df_notes["Unit"].fillna("").str.strip(),
+        )
+    }
+
+
+# Profil compact : catégories pour les chaînes répétées, int16 pour les
+# petites colonnes entières et float32 pour les taux et ratios
+def to_compact_profile(df, df_notes):
+    dtypes = {col: "category" for col in COMPACT_CATEGORY_COLUMNS}
+    dtypes.update({col: "int16" for col in COMPACT_INT16_COLUMNS})
+    dtypes.update({col: "float32" for col in compact_float32_columns(df_notes)})
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in df})
+
+
+def read_compact_demographic_indicators_csv(
+    path=DEMOGRAPHIC_INDICATORS_PATH, usecols=None
+):
+    return to_compact_profile(
+        read_demographic_indicators_csv(path, usecols),
+        load_demographic_indicators_notes(),
     )
 
-    return df
+
+DATA_PROFILES = {
+    "default": read_demographic_indicators_csv,
+    "compact": read_compact_demographic_indicators_csv,
+}
+
+
+# Mémoire occupée par colonne dans chacun des deux profils, et gain obtenu
+def memory_report(df, df_compact):
+    report = pd.DataFrame(
+        {
+            "default": df.memory_usage(index=False, deep=True),
+            "compact": df_compact.memory_usage(index=False, deep=True),
+        }
+    )
+    report["saved"] = report["default"] - report["compact"]
+    report["ratio"] = report["compact"] / report["default"]
+    report.loc["Total"] = report[["default", "compact", "saved"]].sum()
+    report.loc["Total", "ratio"] = (
+        report.loc["Total", "compact"] / report.loc["Total", "default"]
+    )
+    return report.sort_values("saved", ascending=False)
+
+
+# Positions des lignes d'une variante. Les variantes autres que Medium ne
+# couvrent que les années de projection : elles sont complétées par les
+# estimations de la variante Medium pour les années antérieures, placées
+# avant ses projections dans l'ordre du fichier, comme à la lecture en flux
+# (stream_demographic_indicators)
+def variant_rows(df, variant, base_variant=BASE_VARIANT):
+    variants = df["Variant"].to_numpy()
+    times = df["Time"].to_numpy()
+    mask = variants == variant
+    if variant == base_variant or not mask.any():
+        return np.flatnonzero(mask)
+
+    history = (variants == base_variant) & (times < times[mask].min())
+    return np.concatenate([np.flatnonzero(history), np.flatnonzero(mask)])
+
+
+# Variantes présentes dans la table, variante de référence en tête. Quand une
+# seule variante a été chargée (loaded), les estimations de la variante de
+# référence qui la complètent n'en forment pas une autre
+def list_variants(df, base_variant=BASE_VARIANT, loaded=DATA_VARIANT):
+    variants = df["Variant"].dropna().unique()
+    if loaded is not None:
+        return [loaded] if loaded in variants else []
+    return sorted(variants, key=lambda v: (v != base_variant, v))
+
+
+# Positions des lignes de chaque variante présente dans la table
+def variant_partitions(df, base_variant=BASE_VARIANT, loaded=DATA_VARIANT):
+    return {
+        variant: variant_rows(df, variant, base_variant)
+        for variant in list_variants(df, base_variant, loaded)
+    }
+
+
+def select_variant(df, variant):
+    return df.iloc[variant_rows(df, variant)].reset_index(drop=True)
+
+
+# Lignes retenues par les filtres sur les années et la variante, et pour les
+# estimations antérieures à une année donnée
+def filter_rows(df, years=None, variant=None, before=None):
+    mask = np.ones(len(df), dtype=bool)
+    if years is not None:
+        mask &= df["Time"].between(*years).to_numpy()
+    if variant is not None:
+        mask &= (df["Variant"] == variant).to_numpy()
+    if before is not None:
+        mask &= (df["Time"] < before).to_numpy()
+    return df[mask]
+
+
+# Première année d'une variante, lue en flux sur les seules colonnes Variant et
+# Time ; None si la variante est absente du fichier
+def projection_start(path, variant, years=None, chunk_rows=INGEST_CHUNK_ROWS):
+    start = None
+    with read_demographic_indicators_csv(
+        path, usecols=["Variant", "Time"], chunksize=chunk_rows
+    ) as reader:
+        for chunk in reader:
+            times = filter_rows(chunk, years, variant)["Time"]
+            if len(times) and (start is None or times.min() < start):
+                start = int(times.min())
+    return start
+
+
+# Lecture en flux du CSV, morceau par morceau, avec projection des colonnes et
+# filtres appliqués à chaque morceau : la mémoire utilisée ne dépend pas de la
+# taille du fichier. Le premier morceau, vide, fixe les types des colonnes.
+# Comme select_variant, une variante autre que Medium est complétée par les
+# estimations de Medium, écrites avant ses projections
+def stream_demographic_indicators(
+    path=DEMOGRAPHIC_INDICATORS_PATH,
+    profile=DATA_PROFILE,
+    variant=DATA_VARIANT,
+    columns=DATA_COLUMNS,
+    years=DATA_YEARS,
+    chunk_rows=INGEST_CHUNK_ROWS,
+):
+    if profile == "compact":
+        df_notes = load_demographic_indicators_notes()
+        convert = lambda df: to_compact_profile(df, df_notes)
+    else:
+        convert = lambda df: df
+
+    def chunks(**filters):
+        with read_demographic_indicators_csv(
+            path, _usecols(columns), chunksize=chunk_rows
+        ) as reader:
+            for chunk in reader:
+                chunk = filter_rows(chunk, years, **filters)
+                if len(chunk):
+                    yield add_iso_codes(convert(chunk))
+
+    header = read_demographic_indicators_csv(path, _usecols(columns), nrows=0)
+    yield add_iso_codes(convert(header))
+
+    if variant is None or variant == BASE_VARIANT:
+        yield from chunks(variant=variant)
+        return
+    start = projection_start(path, variant, years, chunk_rows)
+    if start is not None:
+        yield from chunks(variant=BASE_VARIANT, before=start)
+        yield from chunks(variant=variant)
+
+
+# Chargement du CSV selon le profil, enrichi des codes ISO des localisations :
+# la colonne ISO_code est calculée une fois puis conservée dans le cache
+def _loader(profile, variant, columns=None, years=None, chunk_rows=0):
+    if chunk_rows:
+        return lambda path: stream_demographic_indicators(
+            path, profile, variant, columns, years, chunk_rows
+        )
+
+    read = DATA_PROFILES[profile]
+
+    def load(path):
+        df = add_iso_codes(filter_rows(read(path, _usecols(columns)), years))
+        if variant is not None:
+            df = select_variant(df, variant)
+        return df
+
+    return load
+
+
+def _cache_name(path, profile, variant=None, columns=None, years=None):
+    parts = [os.path.splitext(os.path.basename(path))[0]]
+    if profile != "default":
+        parts.append(profile)
+    if variant is not None:
+        parts.append(re.sub(r"\W+", "_", variant).lower())
+    if years is not None:
+        parts.append("{}_{}".format(*years))
+    if columns is not None:
+        selected = ",".join(selected_columns(columns))
+        digest = hashlib.sha256(selected.encode()).hexdigest()
+        parts.append(f"cols_{digest[:8]}")
+    return "-".join(parts)
+
+
+# Le CSV n'est analysé qu'une seule fois : les chargements suivants lisent le
+# cache binaire en colonnes (projeté en mémoire), reconstruit si le CSV change
+def load_demographic_indicators(
+    path=DEMOGRAPHIC_INDICATORS_PATH,
+    use_cache=True,
+    cache_dir=CACHE_DIR,
+    shared=SHARED_DATA,
+    profile=DATA_PROFILE,
+    variant=DATA_VARIANT,
+    columns=DATA_COLUMNS,
+    years=DATA_YEARS,
+    chunk_rows=INGEST_CHUNK_ROWS,
+):
+    if not use_cache:
+        # Sans cache, les morceaux devraient de toute façon être réunis
+        return _loader(profile, variant, columns, years)(path)
+
+    return cached_frame(
+        path,
+        _loader(profile, variant, columns, years, chunk_rows),
+        cache_dir,
+        name=_cache_name(path, profile, variant, columns, years),
+        text_as_category=shared,
+    )
+
+
+# Construit (ou valide) le cache sans charger les données, par exemple dans le
+# processus maître gunicorn avant le fork des workers
+def ensure_demographic_indicators_cache(
+    path=DEMOGRAPHIC_INDICATORS_PATH,
+    cache_dir=CACHE_DIR,
+    profile=DATA_PROFILE,
+    variant=DATA_VARIANT,
+    columns=DATA_COLUMNS,
+    years=DATA_YEARS,
+    chunk_rows=INGEST_CHUNK_ROWS,
+):
+    return ensure_store(
+        path,
+        _loader(profile, variant, columns, years, chunk_rows),
+        cache_dir,
+        name=_cache_name(path, profile, variant, columns, years),
+    )
 
 
 def load_demographic_indicators_notes():
     df_notes = pd.read_csv(
-        "data/demographic_indicators_notes.csv",
+        DEMOGRAPHIC_INDICATORS_NOTES_PATH,
         dtype={
             "IndicatorNo": int,
             "Topic": str,
@@ -91,3 +483,362 @@ def load_demographic_indicators_notes():
     )
 
     return df_notes
+
+
+# Cube dense localisation × année × indicateur, contigu en mémoire, avec les
+# correspondances libellé → position de chaque axe. Les séries d'une
+# localisation et les coupes d'une année sont des vues sans copie, que
+# plotly express accepte directement sous forme de dictionnaire de tableaux
+class DemographicCube:
+    def __init__(self, values, locations, years, indicators, location_attributes):
+        self.values = values
+        self.locations = locations
+        self.years = years
+        self.indicators = indicators
+        # Attributs constants par localisation (ISO3_code, LocTypeName...)
+        self.location_attributes = location_attributes
+        self.location_pos = {location: i for i, location in enumerate(locations)}
+        self.year_pos = {year: j for j, year in enumerate(years.tolist())}
+        self.indicator_pos = {col: k for k, col in enumerate(indicators)}
+
+    # Axes du cube d'une partition de la table : localisations et années des
+    # lignes, avec la position de chaque ligne sur ces axes
+    @staticmethod
+    def _axes(df, indicators, rows, attributes):
+        if indicators is None:
+            indicators = [
+                col for col, kind in DEMOGRAPHIC_INDICATORS_DTYPES.items() if kind is float
+            ]
+        indicators = [col for col in indicators if col in df]
+        if rows is None:
+            rows = np.arange(len(df))
+
+        location_codes, locations = pd.factorize(df["Location"].to_numpy()[rows])
+        years, year_codes = np.unique(df["Time"].to_numpy()[rows], return_inverse=True)
+
+        # Première ligne de chaque localisation, pour ses attributs constants
+        _, first = np.unique(location_codes, return_index=True)
+        location_attributes = {
+            col: np.asarray(df[col].to_numpy()[rows][first], dtype=object)
+            for col in attributes
+            if col in df
+        }
+        return {
+            "indicators": indicators,
+            "rows": rows,
+            "locations": np.asarray(locations, dtype=object),
+            "years": years,
+            "location_codes": location_codes,
+            "year_codes": year_codes,
+            "location_attributes": location_attributes,
+        }
+
+    @classmethod
+    def _from_axes(cls, values, axes):
+        return cls(
+            values,
+            axes["locations"],
+            axes["years"],
+            list(axes["indicators"]),
+            axes["location_attributes"],
+        )
+
+    @staticmethod
+    def _fill(df, axes, dtype):
+        indicators = axes["indicators"]
+        values = np.full(
+            (len(axes["locations"]), len(axes["years"]), len(indicators)), np.nan, dtype
+        )
+        values[axes["location_codes"], axes["year_codes"]] = (
+            df[indicators].iloc[axes["rows"]].to_numpy(dtype=dtype)
+        )
+        return values
+
+    # Construit le cube depuis la table (lue depuis le cache binaire) ; rows
+    # restreint le cube à une partition, par exemple une variante
+    @classmethod
+    def from_frame(
+        cls,
+        df,
+        indicators=None,
+        rows=None,
+        dtype=np.float64,
+        attributes=("ISO3_code", "LocTypeName"),
+    ):
+        axes = cls._axes(df, indicators, rows, attributes)
+        return cls._from_axes(cls._fill(df, axes, dtype), axes)
+
+    # Cube arrondi (voir round) écrit une fois dans le répertoire du cache
+    # binaire, puis projeté en mémoire en lecture seule : les workers gunicorn
+    # partagent ses pages au lieu d'en construire chacun une copie. Un seul
+    # processus l'écrit, les autres attendent puis le projettent. Sans
+    # répertoire, le cube est construit en mémoire
+    @classmethod
+    def cached(
+        cls,
+        directory,
+        df,
+        indicators=None,
+        rows=None,
+        decimals=None,
+        dtype=np.float64,
+        attributes=("ISO3_code", "LocTypeName"),
+    ):
+        if directory is None:
+            cube = cls.from_frame(df, indicators, rows, dtype, attributes)
+            return cube.round(decimals) if decimals else cube
+
+        axes = cls._axes(df, indicators, rows, attributes)
+
+        def build():
+            cube = cls._from_axes(cls._fill(df, axes, dtype), axes)
+            return cube.round(decimals) if decimals else cube
+
+        digest = hashlib.sha256(
+            json.dumps(
+                [axes["indicators"], decimals, np.dtype(dtype).str], sort_keys=True
+            ).encode()
+        )
+        digest.update(np.ascontiguousarray(axes["rows"]).tobytes())
+        path = os.path.join(directory, f"cube-{digest.hexdigest()[:16]}.npy")
+
+        try:
+            if not os.path.exists(path):
+                with file_lock(os.path.join(directory, LOCK_FILE)):
+                    if not os.path.exists(path):
+                        write_array(path, build().values)
+            # np.asarray retire la sous-classe memmap sans copier les données
+            values = np.asarray(np.load(path, mmap_mode="r"))
+        except OSError:
+            # Répertoire supprimé ou non accessible en écriture : le cube est
+            # construit en mémoire plutôt que de faire échouer le callback
+            return build()
+        return cls._from_axes(values, axes)
+
+    # Arrondit en place chaque indicateur à son nombre de décimales (voir
+    # indicator_decimals)
+    def round(self, decimals):
+        for indicator, k in self.indicator_pos.items():
+            if indicator in decimals:
+                values = self.values[:, :, k]
+                np.round(values, decimals[indicator], out=values)
+        return self
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _columns(self, columns):
+        return [self.indicator_pos[col] for col in columns]
+
+    # Série d'un indicateur pour une localisation : vue de forme (années,)
+    def series(self, location, indicator):
+        return self.values[self.location_pos[location], :, self.indicator_pos[indicator]]
+
+    # Coupe d'un indicateur pour une année : vue de forme (localisations,)
+    def cross_section(self, year, indicator):
+        return self.values[:, self.year_pos[year], self.indicator_pos[indicator]]
+
+    # Valeurs d'un indicateur par année (lignes) et par localisation
+    # (colonnes), vue sur le cube sans copie
+    def year_matrix(self, indicator):
+        return self.values[:, :, self.indicator_pos[indicator]].T
+
+    def cell(self, location, year, indicator):
+        return self.values[
+            self.location_pos[location],
+            self.year_pos[year],
+            self.indicator_pos[indicator],
+        ]
+
+    # Données d'une localisation au format attendu par plotly express
+    # (data_frame=...), une entrée par indicateur plus la colonne Time
+    def location_data(self, location, columns):
+        if location not in self.location_pos:
+            return {"Time": self.years[:0], **{col: np.empty(0) for col in columns}}
+        return {
+            "Time": self.years,
+            **{col: self.series(location, col) for col in columns},
+        }
+
+    # Données d'une année au format attendu par plotly express, avec le nom
+    # et les attributs de chaque localisation
+    def year_data(self, year, columns):
+        if year not in self.year_pos:
+            empty = self.locations[:0]
+            return {
+                "Location": empty,
+                **{attr: empty for attr in self.location_attributes},
+                **{col: np.empty(0) for col in columns},
+            }
+        return {
+            "Location": self.locations,
+            **self.location_attributes,
+            **{col: self.cross_section(year, col) for col in columns},
+        }
+
+
+# Indicateur servant de poids aux moyennes des taux lors des agrégations
+WEIGHT_INDICATOR = "TPopulation1Jan"
+
+# Nombre de groupes dont les agrégats sont gardés par RegionAggregator
+AGGREGATE_CACHE_SIZE = 256
+
+
+# Indicateurs additifs (effectifs en milliers), sommés lors des agrégations ;
+# les autres (taux, âges) sont des moyennes pondérées par la population, sauf
+# les rapports de RATIO_INDICATORS
+def sum_indicators(df_notes):
+    units = df_notes["Unit"].str.strip()
+    return df_notes.loc[units == COUNT_UNIT, "Indicator"].tolist()
+
+
+# Indicateurs qui rapportent deux quantités additives : l'agrégat est le
+# rapport de leurs sommes, pas une moyenne des rapports. Chaque entrée donne
+# le numérateur et le dénominateur d'une localisation à partir de ses valeurs
+RATIO_INDICATORS = {
+    # Hommes pour 100 femmes
+    "PopSexRatio": (
+        ("TPopulationMale1July", "TPopulationFemale1July"),
+        lambda male, female: (100 * male, female),
+    ),
+    # Habitants par km² : la surface d'une localisation est sa population
+    # divisée par sa densité
+    "PopDensity": (
+        ("TPopulation1July", "PopDensity"),
+        lambda population, density: (population, population / density),
+    ),
+}
+
+
+# Arbre des localisations construit depuis ParentID : chaque LocID connaît
+# ses enfants directs, et un sous-arbre se résout en la liste de ses pays
+class LocationTree:
+    def __init__(self, df):
+        loc_ids = df["LocID"].to_numpy()
+        _, first = np.unique(loc_ids, return_index=True)
+        self.loc_ids = loc_ids[first]
+        self.parent_ids = df["ParentID"].to_numpy()[first]
+        self.names = np.asarray(df["Location"].to_numpy()[first], dtype=object)
+        self.types = np.asarray(df["LocTypeName"].to_numpy()[first], dtype=object)
+
+        self.id_by_name = dict(zip(self.names, self.loc_ids.tolist()))
+        self.name_by_id = dict(zip(self.loc_ids.tolist(), self.names))
+        self.type_by_id = dict(zip(self.loc_ids.tolist(), self.types))
+        self.children = {}
+        for loc_id, parent_id in zip(self.loc_ids.tolist(), self.parent_ids.tolist()):
+            if parent_id != loc_id:
+                self.children.setdefault(parent_id, []).append(loc_id)
+
+    # LocID de la localisation et de tous ses descendants
+    def subtree(self, location):
+        root = self.id_by_name[location]
+        seen = {root}
+        stack = [root]
+        while stack:
+            for child in self.children.get(stack.pop(), []):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+
+    # Pays du sous-arbre : seules les feuilles sont agrégées, les régions
+    # intermédiaires compteraient leurs pays deux fois
+    def countries(self, location):
+        return sorted(
+            self.name_by_id[loc_id]
+            for loc_id in self.subtree(location)
+            if self.type_by_id[loc_id] == COUNTRY_TYPE
+        )
+
+
+# Agrégats de groupes de localisations (sous-arbre de la hiérarchie ou groupe
+# de pays choisi) pour toutes les années et tous les indicateurs d'un
+# DemographicCube, en une passe : la matrice d'appartenance groupe ×
+# localisation est multipliée par le cube. Les résultats des derniers groupes
+# demandés sont gardés ; l'agrégateur est rattaché à une version des données
+# (Dataset.aggregator) et disparaît avec elle
+class RegionAggregator:
+    def __init__(
+        self,
+        cube,
+        tree,
+        sum_columns,
+        weight=WEIGHT_INDICATOR,
+        cache_size=AGGREGATE_CACHE_SIZE,
+    ):
+        self.cube = cube
+        self.tree = tree
+        self.is_sum = np.array([col in set(sum_columns) for col in cube.indicators])
+        self.weight = weight
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._aggregate_one)
+
+    # Numérateurs et dénominateurs des rapports de RATIO_INDICATORS présents
+    # dans le cube, par localisation et par année ; NaN si l'un manque
+    def _ratio_terms(self):
+        pos = self.cube.indicator_pos
+        for indicator, (columns, terms) in RATIO_INDICATORS.items():
+            if indicator not in pos or any(col not in pos for col in columns):
+                continue
+            with np.errstate(invalid="ignore", divide="ignore"):
+                numerator, denominator = terms(
+                    *(self.cube.values[:, :, pos[col]] for col in columns)
+                )
+            valid = np.isfinite(numerator) & np.isfinite(denominator)
+            yield (
+                pos[indicator],
+                np.where(valid, numerator, 0.0),
+                np.where(valid, denominator, 0.0),
+            )
+
+    # Agrège plusieurs groupes à la fois ; groups associe une clé à une liste
+    # de localisations. Renvoie une matrice (années, indicateurs) par clé
+    def aggregate(self, groups):
+        keys = list(groups)
+        values = self.cube.values
+        membership = np.zeros((len(keys), len(self.cube.locations)))
+        for g, key in enumerate(keys):
+            positions = [
+                self.cube.location_pos[location]
+                for location in groups[key]
+                if location in self.cube.location_pos
+            ]
+            membership[g, positions] = 1.0
+
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        weights = filled[:, :, self.cube.indicator_pos[self.weight]][:, :, None]
+
+        counts = np.tensordot(membership, present.astype(float), axes=(1, 0))
+        sums = np.tensordot(membership, filled, axes=(1, 0))
+        weighted = np.tensordot(membership, filled * weights, axes=(1, 0))
+        weight_sums = np.tensordot(membership, present * weights, axes=(1, 0))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = weighted / weight_sums
+            result = np.where(self.is_sum, sums, means)
+            for k, numerator, denominator in self._ratio_terms():
+                result[:, :, k] = np.tensordot(
+                    membership, numerator, axes=(1, 0)
+                ) / np.tensordot(membership, denominator, axes=(1, 0))
+        result[counts == 0] = np.nan
+        return {key: result[g] for g, key in enumerate(keys)}
+
+    def _aggregate_one(self, key, locations):
+        return self.aggregate({key: locations})[key]
+
+    # Agrégats des pays d'un sous-arbre de la hiérarchie (région, continent...)
+    def subtree(self, location):
+        return self._cached(("subtree", location), tuple(self.tree.countries(location)))
+
+    # Agrégats d'un groupe de pays défini par l'utilisateur
+    def group(self, locations):
+        locations = tuple(sorted(set(locations)))
+        return self._cached(("group", locations), locations)
+
+    # Séries d'agrégats au format de DemographicCube.location_data
+    def data(self, result, columns):
+        return {
+            "Time": self.cube.years,
+            **{col: result[:, self.cube.indicator_pos[col]] for col in columns},
+        }
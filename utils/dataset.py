@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from utils.data import (
+    DEMOGRAPHIC_INDICATORS_NOTES_PATH,
+    DemographicCube,
+    LocationTree,
+    RegionAggregator,
+    ensure_demographic_indicators_cache,
+    sum_indicators,
+    variant_partitions,
+)
+from utils.index import DemographicIndex
+from utils.store import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Intervalle, en secondes, entre deux vérifications de la présence d'une
+# nouvelle version des fichiers de données ; 0 désactive le rechargement
+RELOAD_INTERVAL = float(os.environ.get("DATAVIZ_RELOAD_INTERVAL", 0))
+
+
+# Version des données : empreinte du cache binaire des indicateurs (reconstruit
+# au besoin si le CSV a changé) et du fichier des notes
+def dataset_version():
+    store = os.path.basename(ensure_demographic_indicators_cache())
+    notes = file_sha256(DEMOGRAPHIC_INDICATORS_NOTES_PATH)
+    return hashlib.sha256(json.dumps([store, notes]).encode()).hexdigest()[:16]
+
+
+# Version chargée des données : tableau des indicateurs, notes et artefacts
+# précalculés, jamais modifiés une fois construits. Les structures qui en
+# dérivent (index, cubes, classements, mise en page) sont construites à la
+# demande et rattachées à la version : elles disparaissent avec elle. store
+# est le répertoire du cache binaire de la version, où sont écrits les cubes
+# partagés entre les workers (None : structures construites en mémoire)
+class Dataset:
+    def __init__(self, version, df, df_notes, artifacts=None, store=None):
+        self.version = version
+        self.df = df
+        self.df_notes = df_notes
+        self.artifacts = artifacts
+        self.store = store
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derived(self, key, build):
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        # Construite hors du verrou : deux requêtes simultanées peuvent la
+        # construire toutes les deux, la première enregistrée est conservée
+        value = build(self)
+        with self._lock:
+            return self._derived.setdefault(key, value)
+
+    def indexes(self):
+        return self.derived("indexes", variant_indexes)
+
+    def location_tree(self):
+        return self.derived("tree", lambda dataset: LocationTree(dataset.df))
+
+    # Agrégats régionaux d'une variante (clé de indexes())
+    def aggregator(self, variant):
+        return self.derived(
+            ("regions", variant), lambda dataset: region_aggregator(dataset, variant)
+        )
+
+
+# Index des lignes par localisation et par année de chaque variante de
+# projection, partagés par les callbacks et l'export des données. Une table
+# sans colonne de variante a un seul index, sous la clé None
+def variant_indexes(dataset):
+    indexes = {
+        variant: DemographicIndex(dataset.df, rows)
+        for variant, rows in variant_partitions(dataset.df).items()
+    }
+    if not indexes:
+        indexes[None] = DemographicIndex(dataset.df)
+    return indexes
+
+
+# Agrégateur sur le cube complet de la variante (tous les indicateurs, sans
+# arrondi), partagé entre les workers par le cache binaire
+def region_aggregator(dataset, variant):
+    cube = DemographicCube.cached(
+        dataset.store, dataset.df, rows=dataset.indexes()[variant].rows
+    )
+    return RegionAggregator(
+        cube, dataset.location_tree(), sum_indicators(dataset.df_notes)
+    )
+
+
+# Référence vers la version courante, lue par les callbacks à chaque requête.
+# Le remplacement est une simple affectation : une requête en cours garde la
+# version qu'elle a lue au début
+class DatasetHandle:
+    def __init__(self, dataset):
+        self._dataset = dataset
+
+    def current(self):
+        return self._dataset
+
+    def swap(self, dataset):
+        previous, self._dataset = self._dataset, dataset
+        return previous
+
+
+# Surveillance des fichiers de données dans un thread de fond : une nouvelle
+# version est chargée hors du chemin des requêtes puis publiée d'un bloc
+class DatasetWatcher:
+    def __init__(self, handle, load, version=dataset_version, interval=RELOAD_INTERVAL):
+        self.handle = handle
+        self.load = load
+        self.version = version
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_check = None
+        self._thread = None
+
+    # Charge la nouvelle version si elle diffère de la version courante ;
+    # retourne True si elle a été publiée
+    def check(self):
+        version = self.version()
+        self.last_check = time.time()
+        if version == self.handle.current().version:
+            return False
+        started = time.perf_counter()
+        self.handle.swap(self.load(version))
+        self.reloads += 1
+        logger.info(
+            "données rechargées (version %s) en %.1f s",
+            version,
+            time.perf_counter() - started,
+        )
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                # La version courante reste servie jusqu'à la prochaine tentative
+                self.failures += 1
+                logger.exception("échec du rechargement des données")
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="dataset-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stats(self):
+        return {
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_check": self.last_check or 0,
+        }
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from flask import Response, request, stream_with_context
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel : export CSV seul sinon
+    pa = None
+    pq = None
+
+# Nombre de lignes par lot envoyé : la mémoire utilisée par un export ne
+# dépend que de cette taille, pas du nombre de lignes demandées
+EXPORT_BATCH_ROWS = int(os.environ.get("DATAVIZ_EXPORT_BATCH_ROWS", 65536))
+
+# Colonnes d'identification des lignes, ajoutées aux indicateurs demandés
+EXPORT_KEY_COLUMNS = ["LocID", "Location", "ISO3_code", "Variant", "Time"]
+
+EXPORT_MIMETYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _year(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ExportError(f"année invalide : {name}={value}")
+
+
+# Indicateurs demandés (paramètre columns, répétable ou séparé par des
+# virgules), limités à ceux des notes ; tous par défaut
+def export_indicators(args, dataset):
+    indicators = [
+        indicator
+        for indicator in dataset.df_notes["Indicator"]
+        if indicator in dataset.df
+    ]
+    requested = [
+        column
+        for value in args.getlist("columns")
+        for column in value.split(",")
+        if column
+    ]
+    unknown = [column for column in requested if column not in indicators]
+    if unknown:
+        raise ExportError(f"indicateurs inconnus : {', '.join(unknown)}")
+    return requested or indicators
+
+
+def export_columns(args, dataset):
+    keys = [column for column in EXPORT_KEY_COLUMNS if column in dataset.df]
+    return keys + export_indicators(args, dataset)
+
+
+# Variante demandée (paramètre variant), la première de la table par défaut
+def export_variant(args, dataset):
+    indexes = dataset.indexes()
+    variant = args.get("variant")
+    if None in indexes:
+        # Table sans colonne de variante
+        return None
+    if variant is None:
+        return next(iter(indexes))
+    if variant not in indexes:
+        raise ExportError(f"variante inconnue : {variant}")
+    return variant
+
+
+# Positions des lignes retenues par les filtres location (répétable), variant,
+# start et end, lues dans les index de la version des données
+def export_rows(args, dataset):
+    index = dataset.indexes()[export_variant(args, dataset)]
+
+    locations = args.getlist("location")
+    unknown = [location for location in locations if not len(index.positions(location))]
+    if unknown:
+        raise ExportError(f"localisations inconnues : {', '.join(unknown)}")
+    if locations:
+        positions = np.concatenate([index.positions(location) for location in locations])
+    else:
+        positions = index.positions()
+
+    return positions[_year_mask(args, dataset.df["Time"].to_numpy()[positions])]
+
+
+# Années retenues par les filtres start et end
+def _year_mask(args, times):
+    start, end = _year(args, "start"), _year(args, "end")
+    mask = np.ones(len(times), dtype=bool)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times <= end
+    return mask
+
+
+# Agrégats par année d'un groupe de localisations (voir
+# utils.data.RegionAggregator) : les pays sous une localisation de la
+# hiérarchie (location=Europe) ou un groupe de pays (country, répétable)
+def aggregate_frame(args, dataset):
+    location = args.get("location")
+    countries = args.getlist("country")
+    if (location is None) == (not countries):
+        raise ExportError("préciser location ou country")
+
+    aggregator = dataset.aggregator(export_variant(args, dataset))
+    if location is not None:
+        if location not in aggregator.tree.id_by_name:
+            raise ExportError(f"localisation inconnue : {location}")
+        result = aggregator.subtree(location)
+    else:
+        unknown = [c for c in countries if c not in aggregator.cube.location_pos]
+        if unknown:
+            raise ExportError(f"localisations inconnues : {', '.join(unknown)}")
+        result = aggregator.group(countries)
+
+    columns = export_indicators(args, dataset)
+    frame = pd.DataFrame(aggregator.data(result, columns))
+    return frame[_year_mask(args, frame["Time"].to_numpy())].reset_index(drop=True)
+
+
+# Sélections des lots : une tranche quand les lignes du lot se suivent (vue
+# sur les colonnes, sans copie), les positions sinon
+def batch_selections(positions, batch_rows=EXPORT_BATCH_ROWS):
+    for start in range(0, len(positions), batch_rows):
+        batch = positions[start : start + batch_rows]
+        if (np.diff(batch) == 1).all():
+            yield slice(int(batch[0]), int(batch[-1]) + 1)
+        else:
+            yield batch
+
+
+# Fichier en écriture vidé après chaque lot, pour envoyer les octets produits
+# par les écrivains pyarrow au fur et à mesure
+class _StreamSink:
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+# Flux Arrow IPC ou fichier Parquet écrit lot par lot ; les colonnes
+# numériques des tranches sont transmises à pyarrow sans copie
+def arrow_chunks(frame, selections, fmt):
+    schema = pa.Schema.from_pandas(frame.iloc[:0], preserve_index=False)
+    sink = _StreamSink()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema)
+    with writer:
+        for selection in selections:
+            writer.write_batch(
+                pa.RecordBatch.from_pandas(
+                    frame.iloc[selection], schema=schema, preserve_index=False
+                )
+            )
+            yield sink.drain()
+    yield sink.drain()
+
+
+def csv_chunks(frame, selections):
+    yield frame.iloc[:0].to_csv(index=False)
+    for selection in selections:
+        yield frame.iloc[selection].to_csv(index=False, header=False)
+
+
+# Export des données chargées sur /api/data.<format> (arrow, parquet ou csv)
+# et des agrégats régionaux sur /api/aggregate.<format>, lus dans la version
+# courante des données (utils.dataset) et envoyés en flux
+class DataExport:
+    def __init__(self, datasets, batch_rows=EXPORT_BATCH_ROWS):
+        self.datasets = datasets
+        self.batch_rows = batch_rows
+
+    def formats(self):
+        if pa is None:
+            return ["csv"]
+        return list(EXPORT_MIMETYPES)
+
+    def _error(self, message, status=400):
+        return Response(
+            json.dumps({"error": message}), status=status, mimetype="application/json"
+        )
+
+    # Réponse déterministe pour une version des données et une requête
+    def _etag(self, dataset, fmt):
+        query = json.dumps([request.path, sorted(request.args.lists())])
+        return hashlib.sha256(
+            json.dumps([dataset.version, fmt, query]).encode()
+        ).hexdigest()[:32]
+
+    def _not_modified(self, etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    def export(self, fmt):
+        if fmt not in self.formats():
+            return self._error(f"format indisponible : {fmt}", 404)
+
+        dataset = self.datasets.current()
+        try:
+            columns = export_columns(request.args, dataset)
+            positions = export_rows(request.args, dataset)
+        except ExportError as error:
+            return self._error(str(error))
+
+        etag = self._etag(dataset, fmt)
+        if request.if_none_match.contains_weak(etag):
+            return self._not_modified(etag)
+
+        # Sélection des colonnes sans copie des données
+        frame = dataset.df[columns]
+        return self._stream(
+            frame, batch_selections(positions, self.batch_rows), fmt, etag
+        )
+
+    def aggregate(self, fmt):
+        if fmt not in self.formats():
+            return self._error(f"format indisponible : {fmt}", 404)
+
+        dataset = self.datasets.current()
+        etag = self._etag(dataset, fmt)
+        if request.if_none_match.contains_weak(etag):
+            return self._not_modified(etag)
+        try:
+            frame = aggregate_frame(request.args, dataset)
+        except ExportError as error:
+            return self._error(str(error))
+        return self._stream(
+            frame, [slice(0, len(frame))], fmt, etag, "demographic_aggregates"
+        )
+
+    def _stream(self, frame, selections, fmt, etag, name="demographic_indicators"):
+        if fmt == "csv":
+            chunks = csv_chunks(frame, selections)
+        else:
+            chunks = arrow_chunks(frame, selections, fmt)
+
+        response = Response(
+            stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[fmt]
+        )
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Content-Disposition"] = f"attachment; filename={name}.{fmt}"
+        return response
+
+    def register(self, server, prefix="/api"):
+        server.add_url_rule(f"{prefix}/data.<fmt>", "dataviz_export", self.export)
+        server.add_url_rule(
+            f"{prefix}/aggregate.<fmt>", "dataviz_aggregate", self.aggregate
+        )
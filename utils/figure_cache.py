@@ -0,0 +1,202 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from utils.instrumentation import phase, record_cache
+from utils.serialization import serialize
+
+# Budget mémoire du cache de figures de chaque worker, en octets
+FIGURE_CACHE_BYTES = int(os.environ.get("DATAVIZ_FIGURE_CACHE_BYTES", 64 * 2**20))
+
+# Répertoire partagé entre les workers gunicorn ; pas de cache disque si vide
+FIGURE_CACHE_DIR = os.environ.get("DATAVIZ_FIGURE_CACHE_DIR") or None
+FIGURE_CACHE_DIR_BYTES = int(
+    os.environ.get("DATAVIZ_FIGURE_CACHE_DIR_BYTES", 512 * 2**20)
+)
+
+
+# Les arguments porteurs d'une version des données (callbacks.DatasetViews)
+# figurent dans la clé par cette version : un rechargement des données rend
+# inaccessibles les entrées calculées sur la version précédente
+def _key_default(value):
+    version = getattr(value, "version", None)
+    if version is not None:
+        return f"dataset:{version}"
+    return str(value)
+
+
+def cache_key(name, args):
+    return json.dumps([name, args], sort_keys=True, default=_key_default)
+
+
+# Cache disque partagé entre processus : un fichier JSON par entrée, nommé
+# d'après l'empreinte de la clé. La date de modification sert d'horodatage
+# LRU, et les plus anciens fichiers sont supprimés au-delà du budget
+class DiskBackend:
+    def __init__(self, directory, max_bytes=FIGURE_CACHE_DIR_BYTES, prune_every=64):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                payload = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return payload
+
+    def set(self, key, payload):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(key))
+
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+# Cache LRU des sorties de callbacks, stockées sous forme de JSON sérialisé et
+# borné par un budget en octets. Un DiskBackend optionnel sert de second
+# niveau partagé entre les workers
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES, backend=None):
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        # Sorties renvoyées telles que construites, sans cache ni sérialisation
+        # compacte, pour mesurer séparément les deux étapes (benchmarks.run)
+        self.bypass = False
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+        if self.backend is not None:
+            payload = self.backend.get(key)
+            if payload is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store(key, payload)
+                return payload
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = payload
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def set(self, key, payload):
+        self._store(key, payload)
+        if self.backend is not None:
+            self.backend.set(key, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    # Décorateur de callback : la sortie est mise en cache sous forme de JSON
+    # compact (voir utils.serialization) pour chaque combinaison d'entrées, et
+    # relue telle quelle ensuite
+    def memoize(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                if self.bypass:
+                    return func(*args)
+                with phase("body"):
+                    key = cache_key(name, args)
+                    payload = self.get(key)
+                    record_cache(payload is not None)
+                    if payload is None:
+                        payload = serialize(func(*args))
+                        self.set(key, payload)
+                    return json.loads(payload)
+
+            return wrapper
+
+        return decorator
+
+
+def create_figure_cache():
+    backend = DiskBackend(FIGURE_CACHE_DIR) if FIGURE_CACHE_DIR else None
+    return FigureCache(FIGURE_CACHE_BYTES, backend)
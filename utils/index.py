@@ -0,0 +1,60 @@
+import numpy as np
+
+
+# Index des positions de lignes par localisation, par année et par couple
+# (localisation, année), construit une seule fois au démarrage : chaque
+# recherche ne coûte que la taille du groupe au lieu d'un parcours de la table.
+# rows restreint l'index à une partition de la table (une variante de
+# projection par exemple) sans la copier
+class DemographicIndex:
+    def __init__(self, df, rows=None, location_column="Location", time_column="Time"):
+        self.df = df
+        self.rows = rows
+        keys = df[[location_column, time_column]]
+        if rows is not None:
+            keys = keys.iloc[rows]
+        self._by_location = self._group_positions(keys, location_column, rows)
+        self._by_year = self._group_positions(keys, time_column, rows)
+        self._at = self._group_positions(keys, [location_column, time_column], rows)
+        self._empty = df.iloc[np.array([], dtype=np.intp)]
+
+    @staticmethod
+    def _group_positions(keys, columns, rows):
+        groups = keys.groupby(columns, sort=False, observed=True).indices
+        if rows is None:
+            return groups
+        return {key: rows[positions] for key, positions in groups.items()}
+
+    def _take(self, groups, key):
+        positions = groups.get(key)
+        if positions is None:
+            return self._empty
+        return self.df.iloc[positions]
+
+    @property
+    def locations(self):
+        return list(self._by_location)
+
+    @property
+    def years(self):
+        return sorted(self._by_year)
+
+    def frame(self):
+        return self.df if self.rows is None else self.df.iloc[self.rows]
+
+    # Positions des lignes d'une localisation, ou de toute la partition
+    def positions(self, location=None):
+        if location is None:
+            if self.rows is None:
+                return np.arange(len(self.df))
+            return self.rows
+        return self._by_location.get(location, np.array([], dtype=np.intp))
+
+    def by_location(self, location):
+        return self._take(self._by_location, location)
+
+    def by_year(self, year):
+        return self._take(self._by_year, year)
+
+    def at(self, location, year):
+        return self._take(self._at, (location, year))
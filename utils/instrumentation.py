@@ -0,0 +1,374 @@
+import bisect
+import contextlib
+import cProfile
+import functools
+import heapq
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+
+from dash import _callback
+from dash.exceptions import PreventUpdate
+
+# Nombre d'appels les plus lents dont le profil est conservé (0 : pas de profil)
+PROFILE_SLOWEST = int(os.environ.get("DATAVIZ_PROFILE_SLOWEST", 0))
+
+# Profileur utilisé pour ces appels : "cprofile" ou "pyinstrument"
+PROFILER = os.environ.get("DATAVIZ_PROFILER", "cprofile")
+
+# Bornes (en secondes) de l'histogramme des durées d'appel
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Nombre de durées récentes gardées pour calculer les percentiles
+RECENT_CALLS = 1024
+
+# Étapes publiées pour chaque callback. Le filtrage des données est mesuré
+# par phase("filter") dans le corps des callbacks et le corps complet par le
+# cache de figures (phase "body") : la construction en est la différence, et
+# la sérialisation (surcoût de Dash compris) le reste de la durée de l'appel
+PHASES = ("filter", "build", "serialize")
+
+_current = threading.local()
+
+
+# Mesure d'une étape du callback en cours (sans effet hors d'un callback)
+@contextlib.contextmanager
+def phase(name):
+    record = getattr(_current, "record", None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record["phases"][name] += time.perf_counter() - start
+
+
+# Résultat d'une consultation du cache de figures par le callback en cours ;
+# un callback à plusieurs sorties peut en faire plusieurs
+def record_cache(hit):
+    record = getattr(_current, "record", None)
+    if record is not None:
+        record["cache"]["hits" if hit else "misses"] += 1
+
+
+class CallbackStats:
+    def __init__(self, output):
+        self.output = output
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.recent = deque(maxlen=RECENT_CALLS)
+        self.phases = defaultdict(float)
+        self.bytes = 0
+        self.max_bytes = 0
+        self.cache = defaultdict(int)
+
+    def observe(self, duration, record, size):
+        self.calls += 1
+        self.seconds += duration
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.recent.append(duration)
+        phases = record["phases"]
+        body = phases.get("body", phases["filter"])
+        self.phases["filter"] += phases["filter"]
+        self.phases["build"] += max(body - phases["filter"], 0.0)
+        self.phases["serialize"] += max(duration - body, 0.0)
+        self.bytes += size
+        self.max_bytes = max(self.max_bytes, size)
+        for result, count in record["cache"].items():
+            self.cache[result] += count
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def to_dict(self):
+        calls = self.calls or 1
+        return {
+            "output": self.output,
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": self.seconds / calls * 1000,
+            "p50_ms": _ms(self.percentile(0.5)),
+            "p95_ms": _ms(self.percentile(0.95)),
+            "p99_ms": _ms(self.percentile(0.99)),
+            "phases_mean_ms": {
+                name: self.phases[name] / calls * 1000 for name in PHASES
+            },
+            "mean_bytes": self.bytes / calls,
+            "max_bytes": self.max_bytes,
+            "cache_hits": self.cache["hits"],
+            "cache_misses": self.cache["misses"],
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def _labels(labels):
+    return ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+
+
+# Profil des appels les plus lents, capturé avec cProfile ou pyinstrument.
+# Un seul profileur peut être actif à la fois dans un processus (cProfile
+# refuse d'en démarrer un second depuis Python 3.12) : sous un serveur à
+# threads, les appels qui arrivent pendant un profil s'exécutent sans profil
+class SlowestProfiles:
+    def __init__(self, size=PROFILE_SLOWEST, profiler=PROFILER):
+        self.size = size
+        self.profiler = profiler
+        self._heap = []
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self.skipped = 0
+
+    def _start(self):
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    @contextlib.contextmanager
+    def capture(self, name):
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            yield
+            return
+        try:
+            try:
+                profiler = self._start()
+            except ValueError:
+                # Profileur démarré par un autre outil
+                with self._lock:
+                    self.skipped += 1
+                yield
+                return
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                duration = time.perf_counter() - start
+                if self.profiler == "pyinstrument":
+                    profiler.stop()
+                else:
+                    profiler.disable()
+                self._keep(name, duration, profiler)
+        finally:
+            self._active.release()
+
+    def _keep(self, name, duration, profiler):
+        if len(self._heap) >= self.size and duration <= self._heap[0][0]:
+            return
+        if self.profiler == "pyinstrument":
+            text = profiler.output_text()
+        else:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(30)
+            text = stream.getvalue()
+        with self._lock:
+            self._counter += 1
+            entry = (duration, self._counter, name, text)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def to_list(self):
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [
+            {"callback": name, "duration_ms": duration * 1000, "profile": text}
+            for duration, _, name, text in entries
+        ]
+
+
+# Statistiques de tous les callbacks : durée, étapes, taille des réponses et
+# utilisation du cache de figures
+class CallbackMetrics:
+    def __init__(self, profile_slowest=PROFILE_SLOWEST):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.profiles = SlowestProfiles(profile_slowest) if profile_slowest else None
+        self.gauges = {}
+
+    def _stats_for(self, name, output):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = CallbackStats(output)
+        return stats
+
+    # Enveloppe la fonction enregistrée par Dash, qui appelle le corps du
+    # callback puis sérialise la réponse en JSON
+    def wrap(self, name, output, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record = {"phases": defaultdict(float), "cache": defaultdict(int)}
+            _current.record = record
+            start = time.perf_counter()
+            try:
+                if self.profiles is not None:
+                    with self.profiles.capture(name):
+                        response = func(*args, **kwargs)
+                else:
+                    response = func(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                with self._lock:
+                    self._stats_for(name, output).errors += 1
+                raise
+            finally:
+                _current.record = None
+
+            duration = time.perf_counter() - start
+            if isinstance(response, str):
+                response_bytes = response.encode()
+            else:
+                response_bytes = response if isinstance(response, bytes) else b""
+            size = len(response_bytes)
+            with self._lock:
+                self._stats_for(name, output).observe(duration, record, size)
+            return response
+
+        wrapper.instrumented = True
+        return wrapper
+
+    # Instrumente tous les callbacks enregistrés avec dash.callback
+    def instrument_callbacks(self, callback_map=None):
+        callback_map = _callback.GLOBAL_CALLBACK_MAP if callback_map is None else callback_map
+        for output, entry in callback_map.items():
+            # Les callbacks exécutés dans le navigateur n'ont pas de fonction
+            func = entry.get("callback")
+            if func is None or getattr(func, "instrumented", False):
+                continue
+            entry["callback"] = self.wrap(func.__name__, output, func)
+
+    def to_dict(self):
+        with self._lock:
+            callbacks = {name: stats.to_dict() for name, stats in self._stats.items()}
+        report = {"callbacks": callbacks}
+        for name, gauge in self.gauges.items():
+            report[name] = gauge()
+        if self.profiles is not None:
+            report["slowest"] = self.profiles.to_list()
+            report["profiles_skipped"] = self.profiles.skipped
+        return report
+
+    # Export au format texte de Prometheus
+    def to_prometheus(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples, suffix=""):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value, *sample_suffix in samples:
+                sample_name = name + (sample_suffix[0] if sample_suffix else suffix)
+                lines.append(f"{sample_name}{{{_labels(labels)}}} {value}")
+
+        with self._lock:
+            stats = dict(self._stats)
+            labels = {
+                name: {"callback": name, "output": s.output} for name, s in stats.items()
+            }
+            metric(
+                "dataviz_callback_calls_total",
+                "counter",
+                "Nombre d'appels de chaque callback",
+                [(labels[n], s.calls) for n, s in stats.items()],
+            )
+            metric(
+                "dataviz_callback_errors_total",
+                "counter",
+                "Nombre d'appels de chaque callback terminés par une erreur",
+                [(labels[n], s.errors) for n, s in stats.items()],
+            )
+
+            histogram = []
+            for n, s in stats.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), s.buckets):
+                    cumulative += count
+                    histogram.append(({**labels[n], "le": bound}, cumulative, "_bucket"))
+                histogram.append((labels[n], s.seconds, "_sum"))
+                histogram.append((labels[n], s.calls, "_count"))
+            metric(
+                "dataviz_callback_seconds",
+                "histogram",
+                "Durée des appels de callback",
+                histogram,
+            )
+
+            metric(
+                "dataviz_callback_phase_seconds_total",
+                "counter",
+                "Temps passé par étape (filtrage, construction, sérialisation)",
+                [
+                    ({**labels[n], "phase": p}, s.phases[p])
+                    for n, s in stats.items()
+                    for p in PHASES
+                ],
+            )
+            metric(
+                "dataviz_callback_response_bytes_total",
+                "counter",
+                "Taille cumulée des réponses de chaque callback",
+                [(labels[n], s.bytes) for n, s in stats.items()],
+            )
+            metric(
+                "dataviz_callback_response_bytes_max",
+                "gauge",
+                "Taille de la plus grosse réponse de chaque callback",
+                [(labels[n], s.max_bytes) for n, s in stats.items()],
+            )
+            metric(
+                "dataviz_callback_cache_total",
+                "counter",
+                "Consultations du cache de figures par résultat",
+                [
+                    ({**labels[n], "result": result}, s.cache[result])
+                    for n, s in stats.items()
+                    for result in ("hits", "misses")
+                ],
+            )
+
+        for name, gauge in self.gauges.items():
+            samples = [({"key": key}, value) for key, value in gauge().items()]
+            metric(f"dataviz_{name}", "gauge", f"Statistiques {name}", samples)
+
+        return "\n".join(lines) + "\n"
+
+    # Points d'accès /metrics (Prometheus) et /metrics.json sur le serveur Flask
+    def register_routes(self, server, prefix="/metrics"):
+        def prometheus():
+            return server.response_class(
+                self.to_prometheus(), mimetype="text/plain; version=0.0.4"
+            )
+
+        def as_json():
+            return server.response_class(
+                json.dumps(self.to_dict()), mimetype="application/json"
+            )
+
+        server.add_url_rule(prefix, "dataviz_metrics", prometheus)
+        server.add_url_rule(f"{prefix}.json", "dataviz_metrics_json", as_json)
+
+
+metrics = CallbackMetrics()
@@ -0,0 +1,96 @@
+import functools
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pycountry
+
+from utils.ranking import COUNTRY_TYPE
+
+# Noms des Nations Unies que les règles de normalisation ne rapprochent
+# d'aucun nom de pycountry
+ALIASES = {
+    "China, Hong Kong SAR": "HKG",
+    "China, Macao SAR": "MAC",
+    "China, Taiwan Province of China": "TWN",
+    "Dem. People's Republic of Korea": "PRK",
+    "Kosovo (under UNSC res. 1244)": "XKX",
+    "Micronesia (Fed. States of)": "FSM",
+    "Saint Helena": "SHN",
+    "United States Virgin Islands": "VIR",
+    "Wallis and Futuna Islands": "WLF",
+}
+
+
+def normalize_name(name):
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+    return re.sub(r"^the ", "", name)
+
+
+# Formes normalisées d'un nom : tel quel, sans la précision entre parenthèses
+# et, pour "Moldova, Republic of", dans l'ordre "Republic of Moldova".
+# "(and dependencies)" est conservé : "France (and dependencies)" n'est pas
+# la France
+def name_variants(name):
+    variants = {normalize_name(name)}
+    without_parentheses = re.sub(r"\s*\((?!and dependencies\)).*?\)", "", name)
+    variants.add(normalize_name(without_parentheses))
+    if "," in without_parentheses:
+        head, _, tail = without_parentheses.partition(",")
+        variants.add(normalize_name(f"{tail} {head}"))
+    variants.discard("")
+    return variants
+
+
+# Table nom normalisé → code ISO 3166 alpha-3, construite une seule fois à
+# partir des noms usuels, officiels et courts de pycountry
+@functools.lru_cache(maxsize=None)
+def iso_lookup():
+    lookup = {}
+    for country in pycountry.countries:
+        for attr in ("name", "official_name", "common_name"):
+            name = getattr(country, attr, None)
+            if name:
+                for variant in name_variants(name):
+                    lookup.setdefault(variant, country.alpha_3)
+    for name, code in ALIASES.items():
+        lookup[normalize_name(name)] = code
+    return lookup
+
+
+# Le nom exact est essayé avant ses autres formes
+def iso_code(location):
+    lookup = iso_lookup()
+    exact = normalize_name(location)
+    if exact in lookup:
+        return lookup[exact]
+    for variant in sorted(name_variants(location)):
+        if variant in lookup:
+            return lookup[variant]
+    return None
+
+
+# Colonne ISO_code déduite de Location pour les seuls pays (les régions et
+# groupes n'ont pas de code) : une recherche par localisation distincte, puis
+# propagation aux lignes par les codes de factorisation. La colonne reste
+# catégorielle si Location l'est (profil compact)
+def add_iso_codes(df, column="ISO_code"):
+    codes, locations = pd.factorize(df["Location"])
+    is_country = np.zeros(len(locations), dtype=bool)
+    rows = (df["LocTypeName"] == COUNTRY_TYPE).to_numpy() & (codes >= 0)
+    is_country[codes[rows]] = True
+    iso = np.array(
+        [
+            iso_code(str(location)) if country else None
+            for location, country in zip(locations, is_country)
+        ],
+        dtype=object,
+    )
+    values = pd.array(iso, dtype="str").take(codes, allow_fill=True)
+    if isinstance(df["Location"].dtype, pd.CategoricalDtype):
+        values = pd.Categorical(values)
+    df[column] = values
+    return df
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Type de localisation des pays dans la colonne LocTypeName ; tous les autres
+# types (monde, régions, groupes de revenu...) sont des agrégats
+COUNTRY_TYPE = "Country/Area"
+
+LOCATION_TYPES = ("countries", "regions", "all")
+
+
+def location_type_mask(location_type_names, location_types="countries"):
+    if location_types not in LOCATION_TYPES:
+        raise ValueError(
+            f"location_types doit valoir {', '.join(LOCATION_TYPES)} : {location_types!r}"
+        )
+    is_country = np.asarray(location_type_names) == COUNTRY_TYPE
+    if location_types == "countries":
+        return is_country
+    if location_types == "regions":
+        return ~is_country
+    return np.ones(len(is_country), dtype=bool)
+
+
+# Classement des k premières localisations pour chaque couple (année,
+# indicateur) d'un DemographicCube : pour chaque année, argpartition
+# sélectionne sur l'axe des localisations les k plus grandes valeurs de tous
+# les indicateurs à la fois. Les copies temporaires ne portent que sur la
+# coupe d'une année, pas sur tout le cube (projeté en mémoire et partagé)
+class TopKRanking:
+    def __init__(self, cube, k=5, location_types="countries"):
+        self.cube = cube
+        self.location_types = location_types
+
+        mask = location_type_mask(
+            cube.location_attributes["LocTypeName"], location_types
+        )
+        self.locations = cube.locations[mask]
+
+        self.k = min(k, len(self.locations))
+        shape = (self.k,) + cube.values.shape[1:]
+        self.positions = np.empty(shape, dtype=np.intp)
+        self.values = np.empty(shape)
+        if self.k == 0:
+            return
+
+        for j in range(shape[1]):
+            # Les valeurs manquantes passent à -inf et finissent en fin de
+            # classement
+            values = cube.values[mask, j]
+            values = np.where(np.isnan(values), -np.inf, values)
+            top = np.argpartition(-values, self.k - 1, axis=0)[: self.k]
+            top_values = np.take_along_axis(values, top, axis=0)
+            order = np.argsort(-top_values, axis=0, kind="stable")
+            self.positions[:, j] = np.take_along_axis(top, order, axis=0)
+            self.values[:, j] = np.take_along_axis(top_values, order, axis=0)
+
+    # Top des localisations d'une année pour un indicateur, par ordre décroissant
+    def top(self, year, indicator):
+        j = self.cube.year_pos.get(year)
+        if j is None:
+            return pd.DataFrame({"Location": [], indicator: []})
+
+        k = self.cube.indicator_pos[indicator]
+        values = self.values[:, j, k]
+        keep = np.isfinite(values)
+        return pd.DataFrame(
+            {
+                "Location": self.locations[self.positions[:, j, k][keep]],
+                indicator: values[keep],
+            }
+        )
+
+    def tops(self, year, indicators):
+        return {col: self.top(year, col) for col in indicators}
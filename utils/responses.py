@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : gzip seul sinon
+    brotli = None
+
+# Taille en dessous de laquelle les réponses ne sont pas compressées
+COMPRESSION_MIN_BYTES = int(os.environ.get("DATAVIZ_COMPRESSION_MIN_BYTES", 1024))
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Budget des réponses compressées gardées en mémoire, indexées par ETag : la
+# mise en page et les scripts de Dash ne sont compressés qu'une fois
+COMPRESSED_CACHE_BYTES = int(
+    os.environ.get("DATAVIZ_COMPRESSED_CACHE_BYTES", 32 * 2**20)
+)
+
+COMPRESSIBLE_MIMETYPES = ("text/", "application/json", "application/javascript")
+
+
+def content_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def _compressible(response):
+    return response.mimetype.startswith(COMPRESSIBLE_MIMETYPES)
+
+
+# Encodage préféré parmi ceux acceptés par le client
+def accepted_encoding(accept_encodings):
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# Couche de réponse du serveur Flask : ETag calculé sur le contenu et réponse
+# 304 aux revalidations des requêtes GET (mise en page, dépendances, scripts),
+# compression gzip ou brotli selon le client. Les réponses des callbacks
+# (POST, que ni Dash ni les navigateurs ne revalident) sont seulement
+# compressées
+class ResponseLayer:
+    def __init__(self, max_bytes=COMPRESSED_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._compressed = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _cached_compress(self, etag, body, encoding):
+        key = (etag, encoding)
+        with self._lock:
+            data = self._compressed.get(key)
+            if data is not None:
+                self._compressed.move_to_end(key)
+                return data
+
+        data = compress(body, encoding)
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                if key not in self._compressed:
+                    self._compressed[key] = data
+                    self._bytes += len(data)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._compressed.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return data
+
+    def process(self, response):
+        # Fichiers envoyés en flux et réponses déjà traitées
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        body = response.get_data()
+        revalidated = request.method in ("GET", "HEAD")
+        if revalidated:
+            etag, _ = response.get_etag()
+            if etag is None:
+                etag = content_etag(body)
+                # ETag faible : il désigne le contenu quel que soit son encodage
+                response.set_etag(etag, weak=True)
+            if "Cache-Control" not in response.headers:
+                response.headers["Cache-Control"] = "no-cache"
+
+            if request.if_none_match.contains_weak(etag):
+                response.status_code = 304
+                response.set_data(b"")
+                return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = accepted_encoding(request.accept_encodings)
+        if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+            return response
+        if not _compressible(response):
+            return response
+
+        if revalidated:
+            # Mêmes contenus d'une requête à l'autre : compressés une seule fois
+            response.set_data(self._cached_compress(etag, body, encoding))
+        else:
+            response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def register(self, server):
+        server.after_request(self.process)
+
+
+response_layer = ResponseLayer()
@@ -0,0 +1,150 @@
+import base64
+
+import numpy as np
+from plotly.basedatatypes import BaseFigure
+from plotly.io.json import to_json_plotly
+
+# Types entiers des tableaux binaires de plotly, du plus compact au plus large
+INTEGER_DTYPES = ("i1", "u1", "i2", "u2", "i4", "u4")
+
+# Sous-graphiques du thème par défaut, utiles seulement aux types de traces
+# correspondants
+SUBPLOT_TRACE_TYPES = {
+    "geo": {"choropleth", "scattergeo"},
+    "polar": {"barpolar", "scatterpolar", "scatterpolargl"},
+    "ternary": {"scatterternary"},
+    "scene": {
+        "cone",
+        "isosurface",
+        "mesh3d",
+        "scatter3d",
+        "streamtube",
+        "surface",
+        "volume",
+    },
+}
+
+
+# Plus petit type entier contenant toutes les valeurs
+def _integer_dtype(values):
+    if values.size == 0:
+        return np.dtype(INTEGER_DTYPES[0])
+    low, high = values.min(), values.max()
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if low >= info.min and high <= info.max:
+            return np.dtype(dtype)
+    return None
+
+
+# Type le plus compact représentant exactement les valeurs : entier si elles
+# le sont toutes. Les décimales restent en float64, float32 ne les restituant
+# pas à l'identique (libellés et survols affichent les valeurs telles quelles)
+def compact_dtype(values):
+    if values.dtype.kind in "iu":
+        return _integer_dtype(values) or values.dtype
+    if values.dtype.kind != "f" or values.dtype.itemsize < 8:
+        return values.dtype
+    if np.isfinite(values).all() and np.array_equal(np.round(values), values):
+        dtype = _integer_dtype(values)
+        if dtype is not None:
+            return dtype
+    return values.dtype
+
+
+# Tableau numérique au format binaire de plotly ({"dtype", "bdata"}), dans
+# son type compact
+def typed_array(values):
+    dtype = compact_dtype(values)
+    spec = {
+        "dtype": dtype.str.lstrip("<|="),
+        "bdata": base64.b64encode(
+            np.ascontiguousarray(values, dtype=dtype).tobytes()
+        ).decode("ascii"),
+    }
+    if values.ndim > 1:
+        spec["shape"] = ", ".join(str(n) for n in values.shape)
+    return spec
+
+
+# Tableau binaire déjà encodé (figure relue depuis du JSON), réencodé dans son
+# type compact
+def compact_array(spec):
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=spec["dtype"])
+    if "shape" in spec:
+        values = values.reshape([int(n) for n in str(spec["shape"]).split(",")])
+    if compact_dtype(values) == values.dtype:
+        return spec
+    return typed_array(values)
+
+
+# Images successives d'une matrice année × localisation, pour une animation
+# jouée dans le navigateur : la première année en valeurs absolues, les
+# suivantes en écarts à l'année précédente. Les valeurs arrondies à decimals
+# décimales sont comptées en unités de 10^-decimals, si bien que les écarts
+# sont de petits entiers, envoyés dans le plus petit type entier. Les valeurs
+# manquantes sont comptées pour 0 et listées à part (positions à plat)
+def delta_encode(matrix, decimals, years):
+    scale = 10**decimals
+    missing = np.isnan(matrix)
+    units = np.round(np.where(missing, 0, matrix) * scale)
+    return {
+        "years": np.asarray(years),
+        "scale": scale,
+        "base": units[0] if len(units) else units.ravel(),
+        "deltas": np.diff(units, axis=0),
+        "missing": np.flatnonzero(missing),
+    }
+
+
+# Thème réduit aux entrées utilisées par les traces de la figure : les
+# réglages des autres types de traces et des autres sous-graphiques sont
+# identiques d'une réponse à l'autre et n'ont pas d'effet
+def compact_template(template, trace_types):
+    layout = {
+        key: value
+        for key, value in template.get("layout", {}).items()
+        if key not in SUBPLOT_TRACE_TYPES
+        or SUBPLOT_TRACE_TYPES[key] & trace_types
+    }
+    data = {
+        trace_type: value
+        for trace_type, value in template.get("data", {}).items()
+        if trace_type in trace_types
+    }
+    return {"data": data, "layout": layout}
+
+
+def _is_figure(obj):
+    return isinstance(obj.get("data"), list) and isinstance(obj.get("layout"), dict)
+
+
+# Sortie de callback (figures, composants Dash, dictionnaires, listes) mise
+# sous une forme JSON compacte : tableaux numériques binaires dans leur type
+# le plus petit et thème plotly réduit à ce qu'utilise chaque figure
+def compact(obj):
+    if isinstance(obj, BaseFigure):
+        # Propriétés brutes de la figure, sans la copie profonde de to_dict
+        figure = {"data": obj._data, "layout": obj._layout}
+        if obj.frames:
+            figure["frames"] = [frame.to_plotly_json() for frame in obj.frames]
+        return compact(figure)
+    if hasattr(obj, "to_plotly_json"):
+        return compact(obj.to_plotly_json())
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in "iuf":
+        return typed_array(obj)
+    if isinstance(obj, dict):
+        if "bdata" in obj and "dtype" in obj:
+            return compact_array(obj)
+        if _is_figure(obj) and "template" in obj["layout"]:
+            trace_types = {trace.get("type", "scatter") for trace in obj["data"]}
+            template = compact_template(obj["layout"]["template"], trace_types)
+            obj = {**obj, "layout": {**obj["layout"], "template": template}}
+        return {key: compact(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [compact(value) for value in obj]
+    return obj
+
+
+def serialize(obj):
+    return to_json_plotly(compact(obj))
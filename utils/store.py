@@ -0,0 +1,405 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # hors POSIX : pas de verrou entre processus
+    fcntl = None
+
+# Version du format du cache : l'incrémenter invalide tous les caches existants
+STORE_FORMAT = 4
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "current.json"
+CODES_BLOCK = "codes"
+LOCK_FILE = ".lock"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# Verrou exclusif entre processus (workers gunicorn) sur un fichier : un seul
+# construit, les autres attendent, bloqués hors du GIL, que le verrou se libère
+@contextlib.contextmanager
+def file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _is_text(series):
+    return isinstance(series.dtype, pd.CategoricalDtype) or not (
+        pd.api.types.is_numeric_dtype(series.dtype)
+        or pd.api.types.is_bool_dtype(series.dtype)
+    )
+
+
+# Écrit un DataFrame sous forme de blocs .npy (un tableau 2D par type numérique,
+# une colonne par ligne) ; les colonnes texte sont codées en entiers
+def write_store(df, directory, source=None):
+    os.makedirs(directory, exist_ok=True)
+
+    columns = []
+    blocks = {}
+    categories = {}
+    for name in df.columns:
+        series = df[name]
+        if _is_text(series):
+            categorical = pd.Categorical(series)
+            categories[name] = [str(c) for c in categorical.categories]
+            kind = "category" if isinstance(series.dtype, pd.CategoricalDtype) else "str"
+            values = categorical.codes.astype(np.int32)
+            block = CODES_BLOCK
+        else:
+            kind = "numeric"
+            values = series.to_numpy()
+            block = values.dtype.name
+        blocks.setdefault(block, []).append(values)
+        columns.append(
+            {
+                "name": name,
+                "kind": kind,
+                "dtype": str(series.dtype),
+                "block": block,
+                "pos": len(blocks[block]) - 1,
+            }
+        )
+
+    for block, arrays in blocks.items():
+        np.save(os.path.join(directory, f"{block}.npy"), np.vstack(arrays))
+
+    _write_manifest(directory, len(df), source, columns, categories)
+
+
+def _write_manifest(directory, n_rows, source, columns, categories):
+    manifest = {
+        "format": STORE_FORMAT,
+        "n_rows": n_rows,
+        "source": source,
+        "columns": columns,
+        "categories": categories,
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+
+# Écriture du cache par morceaux successifs, pour les fichiers trop gros pour
+# être chargés d'un bloc : chaque colonne est ajoutée à un fichier brut, puis
+# close() recopie ces fichiers dans les blocs .npy par tranches. La mémoire
+# utilisée ne dépend que de la taille des morceaux et du nombre de valeurs
+# texte distinctes
+class StoreWriter:
+    SPILL_DIR = ".spill"
+    COPY_ROWS = 1 << 20
+
+    def __init__(self, directory, source=None):
+        self.directory = directory
+        self.source = source
+        self.spill = os.path.join(directory, self.SPILL_DIR)
+        os.makedirs(self.spill, exist_ok=True)
+        self.n_rows = 0
+        self.columns = None
+        self._codes = {}
+
+    def _start(self, df):
+        self.columns = []
+        for name in df.columns:
+            series = df[name]
+            if _is_text(series):
+                kind = "category" if isinstance(series.dtype, pd.CategoricalDtype) else "str"
+                dtype = np.dtype(np.int32)
+                self._codes[name] = {}
+            else:
+                kind = "numeric"
+                dtype = series.to_numpy().dtype
+            self.columns.append(
+                {"name": name, "kind": kind, "dtype": str(series.dtype), "np": dtype}
+            )
+
+    # Codes des valeurs d'un morceau dans la table de la colonne, complétée
+    # au fil des morceaux (-1 pour les valeurs manquantes)
+    def _encode(self, name, series):
+        codes, uniques = pd.factorize(series)
+        table = self._codes[name]
+        mapping = np.array(
+            [table.setdefault(str(value), len(table)) for value in uniques] + [-1],
+            dtype=np.int32,
+        )
+        return mapping[codes]
+
+    def append(self, df):
+        if self.columns is None:
+            self._start(df)
+        for column in self.columns:
+            name = column["name"]
+            if column["kind"] == "numeric":
+                values = np.asarray(df[name].to_numpy(), dtype=column["np"])
+            else:
+                values = self._encode(name, df[name])
+            with open(os.path.join(self.spill, f"{name}.bin"), "ab") as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+        self.n_rows += len(df)
+
+    def _spilled(self, column):
+        path = os.path.join(self.spill, f"{column['name']}.bin")
+        if self.n_rows == 0:
+            return np.empty(0, dtype=column["np"])
+        return np.memmap(path, dtype=column["np"], mode="r", shape=(self.n_rows,))
+
+    def close(self):
+        if self.columns is None:
+            raise ValueError("aucun morceau à écrire dans le cache")
+
+        # Catégories triées comme dans write_store
+        categories, remaps = {}, {}
+        for name, table in self._codes.items():
+            values = np.array(list(table), dtype=object)
+            order = np.argsort(values, kind="stable")
+            categories[name] = values[order].tolist()
+            remap = np.empty(len(values) + 1, dtype=np.int32)
+            remap[order] = np.arange(len(values), dtype=np.int32)
+            remap[-1] = -1
+            remaps[name] = remap
+
+        blocks = {}
+        for column in self.columns:
+            block = CODES_BLOCK if column["kind"] != "numeric" else column["np"].name
+            blocks.setdefault(block, []).append(column)
+            column["block"] = block
+            column["pos"] = len(blocks[block]) - 1
+
+        for block, block_columns in blocks.items():
+            out = np.lib.format.open_memmap(
+                os.path.join(self.directory, f"{block}.npy"),
+                mode="w+",
+                dtype=block_columns[0]["np"],
+                shape=(len(block_columns), self.n_rows),
+            )
+            for column in block_columns:
+                spilled = self._spilled(column)
+                remap = remaps.get(column["name"])
+                for start in range(0, self.n_rows, self.COPY_ROWS):
+                    values = spilled[start : start + self.COPY_ROWS]
+                    if remap is not None:
+                        values = remap[values]
+                    out[column["pos"], start : start + self.COPY_ROWS] = values
+            out.flush()
+            del out
+
+        shutil.rmtree(self.spill, ignore_errors=True)
+        columns = [
+            {k: v for k, v in column.items() if k != "np"} for column in self.columns
+        ]
+        _write_manifest(self.directory, self.n_rows, self.source, columns, categories)
+
+
+def write_store_chunks(chunks, directory, source=None):
+    writer = StoreWriter(directory, source)
+    for chunk in chunks:
+        writer.append(chunk)
+    writer.close()
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+# Relit un cache écrit par write_store ; les blocs numériques sont projetés en
+# mémoire (mmap) et les colonnes du DataFrame sont des vues sur ces blocs.
+# Avec text_as_category, les colonnes texte restent des catégories au lieu
+# d'être décodées en chaînes Python propres à chaque processus
+def read_store(directory, mmap=True, text_as_category=False):
+    manifest = read_manifest(directory)
+    mmap_mode = "r" if mmap else None
+
+    blocks = {}
+    data = {}
+    for column in manifest["columns"]:
+        block = column["block"]
+        if block not in blocks:
+            blocks[block] = np.load(
+                os.path.join(directory, f"{block}.npy"), mmap_mode=mmap_mode
+            )
+        # np.asarray retire la sous-classe memmap sans copier les données
+        values = np.asarray(blocks[block][column["pos"]])
+        name = column["name"]
+        if column["kind"] == "numeric":
+            data[name] = values
+            continue
+
+        categorical = pd.Categorical.from_codes(
+            values, categories=manifest["categories"][name]
+        )
+        if column["kind"] == "category" or text_as_category:
+            data[name] = categorical
+        else:
+            data[name] = pd.Series(
+                np.asarray(categorical, dtype=object), dtype=column["dtype"]
+            )
+
+    return pd.DataFrame(data, copy=False)
+
+
+def _store_format(directory):
+    try:
+        return read_manifest(directory).get("format")
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path, payload):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+# Écrit un tableau dans un fichier .npy publié d'un bloc (renommage atomique),
+# relisible ensuite avec np.load(..., mmap_mode="r")
+def write_array(path, values):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, values)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read_current(root):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if current.get("format") != STORE_FORMAT:
+        return None
+    if not os.path.exists(os.path.join(root, current["directory"], MANIFEST_FILE)):
+        return None
+    return current
+
+
+# Répertoire de la version publiée, quel que soit son format ; None sinon
+def _current_directory(root):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return json.load(f).get("directory")
+    except (OSError, ValueError):
+        return None
+
+
+# Construit le cache d'un fichier source dans un répertoire temporaire puis le
+# publie d'un bloc (renommage atomique), pour que plusieurs processus puissent
+# le reconstruire en même temps sans se gêner
+def build_store(path, load, root, sha256=None):
+    os.makedirs(root, exist_ok=True)
+    fingerprint = source_fingerprint(path)
+    sha256 = sha256 or file_sha256(path)
+    source = {"path": os.path.abspath(path), "sha256": sha256, **fingerprint}
+
+    directory = sha256[:16]
+    final_path = os.path.join(root, directory)
+    if _store_format(final_path) != STORE_FORMAT:
+        # Cache du même fichier source écrit dans un format précédent
+        shutil.rmtree(final_path, ignore_errors=True)
+        tmp_path = tempfile.mkdtemp(dir=root, prefix=".build-")
+        try:
+            data = load(path)
+            # Un chargeur peut aussi fournir les données par morceaux
+            if isinstance(data, pd.DataFrame):
+                write_store(data, tmp_path, source)
+            else:
+                write_store_chunks(data, tmp_path, source)
+            os.chmod(tmp_path, 0o755)
+            try:
+                os.rename(tmp_path, final_path)
+            except OSError:
+                # Un autre processus a publié le même cache entre-temps
+                pass
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    previous = _current_directory(root)
+    current = {"format": STORE_FORMAT, "directory": directory, **source}
+    _write_json_atomic(os.path.join(root, CURRENT_FILE), current)
+
+    # Supprimer les caches des versions plus anciennes du fichier source. La
+    # version remplacée est gardée jusqu'à la reconstruction suivante : les
+    # workers qui ne l'ont pas encore quittée la lisent encore (cubes compris)
+    keep = {directory, previous, CURRENT_FILE}
+    for entry in os.listdir(root):
+        if entry not in keep and not entry.startswith("."):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+    return current
+
+
+def _matches(current, fingerprint):
+    return current is not None and all(
+        current[k] == v for k, v in fingerprint.items()
+    )
+
+
+# Retourne le cache à jour d'un fichier source : la taille et la date de
+# modification suffisent quand elles n'ont pas changé, sinon on compare
+# l'empreinte SHA-256 avant de reconstruire. Quand le fichier change, un seul
+# processus reconstruit le cache ; les autres attendent la fin de la
+# construction puis lisent le cache qu'il a publié
+def ensure_store(path, load, cache_dir, name=None):
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    root = os.path.join(cache_dir, name)
+
+    current = _read_current(root)
+    if _matches(current, source_fingerprint(path)):
+        return os.path.join(root, current["directory"])
+
+    os.makedirs(root, exist_ok=True)
+    with file_lock(os.path.join(root, LOCK_FILE)):
+        # Cache publié par un autre processus pendant l'attente du verrou
+        current = _read_current(root)
+        fingerprint = source_fingerprint(path)
+        if _matches(current, fingerprint):
+            return os.path.join(root, current["directory"])
+
+        sha256 = file_sha256(path)
+        if current is not None and current["sha256"] == sha256:
+            current.update(fingerprint)
+            _write_json_atomic(os.path.join(root, CURRENT_FILE), current)
+            return os.path.join(root, current["directory"])
+
+        current = build_store(path, load, root, sha256)
+    return os.path.join(root, current["directory"])
+
+
+def cached_frame(path, load, cache_dir, name=None, mmap=True, text_as_category=False):
+    return read_store(
+        ensure_store(path, load, cache_dir, name),
+        mmap=mmap,
+        text_as_category=text_as_category,
+    )